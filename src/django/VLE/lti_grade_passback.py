@@ -1,9 +1,68 @@
+import socket
+import threading
+import time
+import urllib.parse
 import xml.etree.cElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 
+import httplib2
 import oauth2
 from django.conf import settings
-
-from VLE.models import Counter
+from django.db import connection
+
+_local = threading.local()
+_lock = threading.Lock()
+_host_limits = {}
+_executor = None
+
+
+def _client(host, key, secret):
+    """Get the client of the current thread for the host, which keeps its connection alive between requests."""
+    clients = getattr(_local, 'clients', None)
+    if clients is None:
+        clients = _local.clients = {}
+    if (host, key, secret) not in clients:
+        clients[host, key, secret] = oauth2.Client(
+            oauth2.Consumer(key, secret), timeout=settings.LTI_PASSBACK_TIMEOUT)
+    return clients[host, key, secret]
+
+
+def _host_limit(host):
+    with _lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(settings.LTI_PASSBACK_HOST_CONCURRENCY)
+        return _host_limits[host]
+
+
+def _pool():
+    """Get the threads sending the requests, which live as long as the process so their connections are reused."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.LTI_PASSBACK_WORKERS, thread_name_prefix='passback')
+        return _executor
+
+
+def post(url, body, key, secret):
+    """Post the xml body to the url, signed with the oauth key and secret, returning the content of the response.
+
+    Timeouts, dropped connections and server errors are retried with exponential backoff. This does not access the
+    database, so it can be called from any thread.
+    """
+    host = urllib.parse.urlsplit(url).netloc
+    for attempt in range(settings.LTI_PASSBACK_RETRIES + 1):
+        retries_left = attempt < settings.LTI_PASSBACK_RETRIES
+        try:
+            with _host_limit(host):
+                response, content = _client(host, key, secret).request(
+                    url, 'POST', body=body, headers={'Content-Type': 'application/xml'})
+        except (socket.timeout, ConnectionError):
+            if not retries_left:
+                raise
+        else:
+            if response.status < 500 or not retries_left:
+                return content
+        time.sleep(settings.LTI_PASSBACK_BACKOFF * 2 ** attempt)
 
 
 class GradePassBackRequest(object):
@@ -33,12 +92,13 @@ class GradePassBackRequest(object):
 
     @classmethod
     def get_message_id_and_increment(cls):
-        """Get the current count for message_id and increment this count."""
-        message_id_counter = Counter.objects.get_or_create(name='message_id')[0]
-        count = message_id_counter.count
-        message_id_counter.count += 1
-        message_id_counter.save()
-        return str(count)
+        """Get the next message_id.
+
+        The ids are taken from a database sequence, so concurrent requests never wait for each other or get the same id.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval('\"VLE_message_id_seq\"')")
+            return str(cursor.fetchone()[0])
 
     def create_xml(self):
         """Create the xml used as the body of the lti communication."""
@@ -95,22 +155,54 @@ class GradePassBackRequest(object):
 
         returns response dictionary with status of request
         """
+        return self._send(self._prepare())
+
+    @classmethod
+    def send_post_requests(cls, requests):
+        """
+        Send the grade replace post requests concurrently.
+
+        The xml bodies are created first, in the current thread, as they take a message id from the database.
+
+        Arguments:
+        requests -- list of requests, None can be given instead of a request and gives None as its response
+
+        returns the response dictionaries in the order of the requests
+        """
+        prepared = [(request, request._prepare()) for request in requests if request is not None]
+        if len(prepared) > 1:
+            responses = iter(_pool().map(lambda args: args[0]._send(args[1]), prepared))
+        else:
+            responses = iter([request._send(body) for request, body in prepared])
+        return [None if request is None else next(responses) for request in requests]
+
+    def _prepare(self):
+        """Load everything needed to send the request, returns the xml body or None when it cannot be sent."""
         if self.url is not None and self.sourcedid is not None:
-            consumer = oauth2.Consumer(
-                self.key, self.secret
-            )
-            client = oauth2.Client(consumer)
-            _, content = client.request(
-                self.url,
-                'POST',
-                body=self.create_xml(),
-                headers={'Content-Type': 'application/xml'}
-            )
+            self.username = self.author.user.username
+            return self.create_xml()
+        return None
+
+    def _send(self, body):
+        """Send the prepared request, without accessing the database.
+
+        When the LMS cannot be reached or gives no valid response after the retries, an unsuccessful response is
+        returned, so the other requests sent together are not affected.
+        """
+        if body is not None:
+            try:
+                result = self.parse_return_xml(post(self.url, body, self.key, self.secret))
+            except (OSError, httplib2.HttpLib2Error, ET.ParseError) as error:
+                result = {
+                    'severity': 'error',
+                    'code_mayor': 'failure',
+                    'description': 'The LMS could not be reached: {}'.format(error),
+                }
             return {
-                'user': self.author.user.username,
+                'user': self.username,
                 'grade': 'NOT UPDATED' if self.score is None else self.score,
                 'result_data': self.result_data,
-                **self.parse_return_xml(content),
+                **result,
             }
         return {
             'severity': 'status',
@@ -0,0 +1,31 @@
+"""
+Rebuild grading queue.
+
+Recompute the grading queue from all entries, or verify it.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from VLE.models import Entry, GradingQueueItem
+
+
+class Command(BaseCommand):
+    """Recompute the grading queue from all entries."""
+
+    help = 'Recomputes the grading queue from all entries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only report the entries with an outdated queue item, without changing them.')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            outdated = GradingQueueItem.objects.outdated()
+            if outdated:
+                raise CommandError('{} entry(s) have an outdated queue item: {}'.format(
+                    len(outdated), ', '.join(str(pk) for pk in outdated)))
+            self.stdout.write('The grading queue is up to date.')
+        else:
+            GradingQueueItem.objects.refresh(Entry.objects.values('pk'))
+            self.stdout.write('Rebuilt the grading queue, {} entry(s) need marking.'.format(
+                GradingQueueItem.objects.count()))
@@ -0,0 +1,53 @@
+"""
+Rebuild journal eligibility.
+
+Recompute the stored eligibility of all assignment participations, verify it or benchmark it.
+"""
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from VLE.models import AssignmentParticipation, Journal
+
+
+class Command(BaseCommand):
+    """Recompute the stored eligibility of all assignment participations."""
+
+    help = 'Recomputes whether the users of all assignment participations can have a journal.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only report the outdated eligibility and the journals filtered differently, without changing them.')
+        parser.add_argument(
+            '--benchmark', type=int, metavar='RUNS', default=0,
+            help='Time filtering all journals on the stored eligibility against joining the participations.')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            self.benchmark(options['benchmark'])
+        elif options['verify']:
+            self.verify()
+        else:
+            updated = AssignmentParticipation.objects.all().update_eligibility()
+            self.stdout.write('Rebuilt the eligibility of {} assignment participation(s).'.format(updated))
+
+    def verify(self):
+        outdated = list(AssignmentParticipation.objects.all().outdated_eligibility().values_list('pk', flat=True))
+        if outdated:
+            raise CommandError('{} assignment participation(s) have an outdated eligibility: {}'.format(
+                len(outdated), ', '.join(str(pk) for pk in outdated)))
+
+        stored = set(Journal.all_objects.eligible().values_list('pk', flat=True))
+        joined = set(Journal.all_objects.eligible_by_joins().values_list('pk', flat=True))
+        if stored != joined:
+            raise CommandError('Journal(s) filtered differently: {}'.format(
+                ', '.join(str(pk) for pk in sorted(stored ^ joined))))
+
+        self.stdout.write('The eligibility of all assignment participations is up to date.')
+
+    def benchmark(self, runs):
+        journals = Journal.all_objects.all()
+        for name, queryset in [('stored', journals.eligible), ('joined', journals.eligible_by_joins)]:
+            seconds = timeit.timeit(lambda: list(queryset().values_list('pk', flat=True)), number=runs)
+            self.stdout.write('{}: {:.2f} ms per query over {} run(s)'.format(name, seconds * 1000 / runs, runs))
@@ -0,0 +1,30 @@
+"""
+Rebuild journal summaries.
+
+Recompute the stored grade and entry summaries of all journals, or verify them.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from VLE.models import Journal
+
+
+class Command(BaseCommand):
+    """Recompute the stored grade and entry summaries of all journals."""
+
+    help = 'Recomputes the stored grade and entry summaries of all journals.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only report the journals with an outdated summary, without changing them.')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            outdated = list(Journal.all_objects.all().outdated_summaries().values_list('pk', flat=True))
+            if outdated:
+                raise CommandError('{} journal(s) have an outdated summary: {}'.format(
+                    len(outdated), ', '.join(str(pk) for pk in outdated)))
+            self.stdout.write('All journal summaries are up to date.')
+        else:
+            updated = Journal.all_objects.all().update_summaries()
+            self.stdout.write('Rebuilt the summaries of {} journal(s).'.format(updated))
@@ -0,0 +1,67 @@
+# Generated by Django 2.2.8 on 2020-03-16 10:12
+
+from django.db import migrations, models
+from django.db.models import Count, FloatField, IntegerField, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+
+def fill_journal_summaries(apps, schema_editor):
+    Journal = apps.get_model('VLE', 'Journal')
+    Node = apps.get_model('VLE', 'Node')
+    nodes = Node.objects.filter(journal=OuterRef('pk'), entry__isnull=False).order_by().values('journal')
+
+    def aggregate(expression, output_field):
+        return Coalesce(Subquery(nodes.annotate(value=expression).values('value'), output_field=output_field), 0)
+
+    Journal.all_objects.update(
+        published_points=aggregate(Sum('entry__grade__grade', filter=Q(entry__grade__published=True)), FloatField()),
+        submitted_count=aggregate(Count('pk'), IntegerField()),
+        graded_count=aggregate(Count('pk', filter=Q(entry__grade__grade__isnull=False)), IntegerField()),
+        published_count=aggregate(Count('pk', filter=Q(entry__grade__published=True)), IntegerField()),
+        unpublished_count=aggregate(
+            Count('pk', filter=Q(entry__grade__published=False, entry__grade__grade__isnull=False)), IntegerField()),
+        last_activity=Subquery(
+            nodes.annotate(value=Greatest(Max('entry__last_edited'), Max('entry__grade__creation_date')))
+            .values('value'), output_field=models.DateTimeField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VLE', '0040_group_assignments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journal',
+            name='published_points',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='journal',
+            name='submitted_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='journal',
+            name='graded_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='journal',
+            name='published_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='journal',
+            name='unpublished_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='journal',
+            name='last_activity',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(fill_journal_summaries, migrations.RunPython.noop),
+    ]
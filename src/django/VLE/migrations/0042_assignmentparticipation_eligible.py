@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:55
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Q
+
+
+def fill_eligibility(apps, schema_editor):
+    AssignmentParticipation = apps.get_model('VLE', 'AssignmentParticipation')
+    Participation = apps.get_model('VLE', 'Participation')
+
+    AssignmentParticipation.objects.update(eligible=Exists(Participation.objects.filter(
+        Q(course__assignment__assigned_groups=None) | Q(groups__assignment=OuterRef('assignment')),
+        user=OuterRef('user'), course__assignment=OuterRef('assignment'), role__can_have_journal=True,
+    )))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VLE', '0041_journal_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignmentparticipation',
+            name='eligible',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='assignmentparticipation',
+            index=models.Index(condition=models.Q(eligible=True), fields=['journal'], name='eligible_journal_idx'),
+        ),
+        migrations.RunPython(fill_eligibility, migrations.RunPython.noop),
+    ]
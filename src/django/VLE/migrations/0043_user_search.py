@@ -0,0 +1,35 @@
+# Generated by Django 2.2.28 on 2026-10-18 22:20
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+import VLE.models
+
+# The indexes match the expressions of the icontains lookups used by UserQuerySet.search
+SEARCH_INDEXES = [
+    ('user_username_trgm_idx', 'UPPER("username"::citext)'),
+    ('user_full_name_trgm_idx', 'UPPER("full_name"::text)'),
+    ('user_email_trgm_idx', 'UPPER("email"::citext)'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VLE', '0042_assignmentparticipation_eligible'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', VLE.models.VLEUserManager()),
+            ],
+        ),
+        TrigramExtension(),
+    ] + [
+        migrations.RunSQL(
+            'CREATE INDEX "{}" ON "VLE_user" USING gin (({}) gin_trgm_ops);'.format(name, expression),
+            'DROP INDEX "{}";'.format(name),
+        ) for name, expression in SEARCH_INDEXES
+    ]
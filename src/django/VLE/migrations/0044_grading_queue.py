@@ -0,0 +1,45 @@
+# Generated by Django 2.2.28 on 2026-10-18 22:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def fill_grading_queue(apps, schema_editor):
+    Entry = apps.get_model('VLE', 'Entry')
+    GradingQueueItem = apps.get_model('VLE', 'GradingQueueItem')
+
+    entries = Entry.objects.filter(node__isnull=False).filter(
+        Q(grade__isnull=True) | Q(grade__grade__isnull=True) | Q(grade__published=False))
+    GradingQueueItem.objects.bulk_create([
+        GradingQueueItem(
+            entry_id=entry, journal_id=journal, assignment_id=assignment, submitted=submitted,
+            state='ungraded' if grade is None else 'unpublished')
+        for entry, journal, assignment, submitted, grade in entries.values_list(
+            'pk', 'node__journal', 'node__journal__assignment', 'last_edited', 'grade__grade').iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VLE', '0043_user_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradingQueueItem',
+            fields=[
+                ('entry', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='VLE.Entry')),
+                ('submitted', models.DateTimeField()),
+                ('state', models.TextField(choices=[('ungraded', 'ungraded'), ('unpublished', 'unpublished')])),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='VLE.Assignment')),
+                ('journal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='VLE.Journal')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='gradingqueueitem',
+            index=models.Index(fields=['assignment', 'submitted'], name='grading_queue_assignment_idx'),
+        ),
+        migrations.RunPython(fill_grading_queue, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VLE', '0044_grading_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PassbackOutbox',
+            fields=[
+                ('journal', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='VLE.Journal')),
+                ('dirty_since', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VLE', '0045_passback_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(condition=models.Q(_negated=True, vle_coupling='Everything is sent to VLE'), fields=['vle_coupling'], name='entry_vle_coupling_idx'),
+        ),
+    ]
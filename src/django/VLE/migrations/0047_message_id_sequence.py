@@ -0,0 +1,25 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:40
+
+from django.db import migrations
+
+# Continue from the message_id counter, so no message id is handed out twice
+CREATE_SEQUENCE = '''
+CREATE SEQUENCE "VLE_message_id_seq" MINVALUE 0 START 0;
+SELECT setval('"VLE_message_id_seq"', "count", false) FROM "VLE_counter" WHERE "name" = 'message_id';
+'''
+
+DROP_SEQUENCE = '''
+UPDATE "VLE_counter" SET "count" = nextval('"VLE_message_id_seq"') WHERE "name" = 'message_id';
+DROP SEQUENCE "VLE_message_id_seq";
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VLE', '0046_entry_vle_coupling_idx'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SEQUENCE, DROP_SEQUENCE),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-19 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VLE', '0047_message_id_sequence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='journal',
+            name='LMS_grade',
+            field=models.FloatField(default=0),
+        ),
+    ]
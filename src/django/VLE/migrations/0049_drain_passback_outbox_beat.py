@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-19 09:12
+
+from django.db import migrations
+
+DRAIN_PASSBACK_OUTBOX = 'drain-passback-outbox'
+
+
+def create_drain_passback_outbox_beat(apps, schema_editor):
+    IntervalSchedule = apps.get_model('django_celery_beat', 'IntervalSchedule')
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+
+    # Runs every LMS_PASSBACK_WINDOW (60) seconds
+    interval, _ = IntervalSchedule.objects.get_or_create(every=60, period='seconds')
+    PeriodicTask.objects.get_or_create(
+        name=DRAIN_PASSBACK_OUTBOX,
+        defaults={'task': 'VLE.tasks.beats.lti.drain_passback_outbox', 'interval': interval})
+
+
+def remove_drain_passback_outbox_beat(apps, schema_editor):
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTask.objects.filter(name=DRAIN_PASSBACK_OUTBOX).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VLE', '0048_journal_lms_grade_float'),
+        ('django_celery_beat', '0011_auto_20190508_0153'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_drain_passback_outbox_beat, remove_drain_passback_outbox_beat),
+    ]
@@ -8,18 +8,20 @@ import random
 import string
 
 from django.conf import settings
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.contrib.postgres.fields import ArrayField, CIEmailField, CITextField
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import F, Q, Sum
+from django.db import models, transaction
+from django.db.models import (Case, Count, Exists, F, FloatField, Func, IntegerField, Max, OuterRef, Q, Subquery, Sum,
+                              Value, When)
+from django.db.models.functions import Abs, Coalesce, Greatest
 from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.timezone import now
 
 import VLE.permissions as permissions
 import VLE.utils.file_handling as file_handling
-from VLE.utils import sanitization
+from VLE.utils import etags, request_cache, sanitization, template_cache
 from VLE.utils.error_handling import (VLEBadRequest, VLEParticipationError, VLEPermissionError, VLEProgrammingError,
                                       VLEUnverifiedEmailError)
 
@@ -144,6 +146,53 @@ def auto_delete_file_on_delete(sender, instance, **kwargs):
             os.remove(instance.file.path)
 
 
+class UserQuerySet(models.QuerySet):
+    def viewable_by(self, user):
+        """Filter on the users the user can view, following the rules of User.can_view."""
+        if user.is_superuser:
+            return self.all()
+
+        courses = Participation.objects.filter(user=user).values('course')
+        supervised_courses = Participation.objects.filter(
+            Q(role__can_view_all_journals=True) | Q(role__can_view_course_users=True), user=user).values('course')
+        return self.annotate(
+            viewer_is_supervisor=Exists(Participation.objects.filter(
+                user=OuterRef('pk'), course__in=supervised_courses)),
+            viewer_is_supervised=Exists(Participation.objects.filter(
+                Q(role__can_view_all_journals=True) | Q(role__can_view_course_users=True),
+                user=OuterRef('pk'), course__in=courses)),
+            viewer_is_coauthor=Exists(AssignmentParticipation.objects.filter(
+                user=OuterRef('pk'), journal__in=Journal.objects.filter(authors__user=user).values('pk'))),
+        ).filter(
+            Q(pk=user.pk) | Q(viewer_is_supervisor=True) | Q(viewer_is_supervised=True) | Q(viewer_is_coauthor=True)
+        )
+
+    def can_have_journal(self, assignment):
+        """Filter on the users that can have a journal in the assignment, following has_permission('can_have_journal').
+
+        Users that can view all journals in one of the courses of the assignment cannot have a journal themselves.
+        """
+        participations = Participation.objects.filter(user=OuterRef('pk'), course__in=assignment.courses.values('pk'))
+        return self.filter(is_superuser=False).annotate(
+            has_journal_role=Exists(participations.filter(role__can_have_journal=True)),
+            has_supervisor_role=Exists(participations.filter(role__can_view_all_journals=True)),
+        ).filter(has_journal_role=True, has_supervisor_role=False)
+
+    def search(self, query, email=False):
+        """Filter on the users of which the username or full name, and optionally the email, contain the query.
+
+        The lookups ignore case and are backed by trigram indexes.
+        """
+        matches = Q(username__icontains=query) | Q(full_name__icontains=query)
+        if email:
+            matches |= Q(email__icontains=query)
+        return self.filter(matches)
+
+
+class VLEUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
+
+
 class User(AbstractUser):
     """User.
 
@@ -154,6 +203,7 @@ class User(AbstractUser):
     - password: the hash of the password of the user.
     - lti_id: the DLO id of the user.
     """
+    objects = VLEUserManager()
 
     full_name = models.CharField(
         null=False,
@@ -233,9 +283,9 @@ class User(AbstractUser):
         if self.is_superuser:
             return True
         if isinstance(obj, Course):
-            return Course.objects.filter(pk=obj.pk, users=self).exists()
+            return permissions.is_participant_in_any(self, [obj.pk])
         if isinstance(obj, Assignment):
-            return Assignment.objects.filter(pk=obj.pk, courses__users=self).exists()
+            return permissions.is_participant_in_any(self, permissions.assignment_course_ids(obj))
         raise VLEProgrammingError("Participant object must be of type Course or Assignment.")
 
     def check_can_view(self, obj):
@@ -257,7 +307,8 @@ class User(AbstractUser):
                 return obj.is_published or self.has_permission('can_view_unpublished_assignment', obj)
             return False
         elif isinstance(obj, Journal):
-            if not obj.authors.filter(user=self).exists():
+            # Iterate over all authors so prefetched authors are used
+            if not any(author.user_id == self.pk for author in obj.authors.all()):
                 return self.has_permission('can_view_all_journals', obj.assignment)
             else:
                 return self.has_permission('can_have_journal', obj.assignment)
@@ -415,7 +466,6 @@ class Course(models.Model):
     - active_lti_id: (optional) the active VLE id of the course linked through LTI which receives grade updates.
     - lti_id_set: (optional) the set of VLE lti_id_set which permit basic access.
     """
-
     name = models.TextField()
     abbreviation = models.TextField(
         max_length=10,
@@ -500,6 +550,16 @@ class Group(models.Model):
         return "{} ({})".format(self.name, self.pk)
 
 
+class RoleQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """Update the roles, invalidating what depends on them, as queryset updates send no signals."""
+        courses = list(self.values_list('course', flat=True).distinct())
+        updated = super(RoleQuerySet, self).update(**kwargs)
+        permissions.invalidate_cached_permissions()
+        AssignmentParticipation.objects.filter(assignment__courses__in=courses).update_eligibility()
+        return updated
+
+
 class Role(models.Model):
     """Role.
 
@@ -547,6 +607,8 @@ class Role(models.Model):
     ]
     PERMISSIONS = COURSE_PERMISSIONS + ASSIGNMENT_PERMISSIONS
 
+    objects = RoleQuerySet.as_manager()
+
     name = models.TextField()
 
     course = models.ForeignKey(
@@ -625,6 +687,20 @@ class Role(models.Model):
         unique_together = ('name', 'course',)
 
 
+class ParticipationQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """Update the participations, invalidating what depends on them, as queryset updates send no signals."""
+        users, courses = set(), set()
+        for user, course in self.values_list('user', 'course'):
+            users.add(user)
+            courses.add(course)
+        updated = super(ParticipationQuerySet, self).update(**kwargs)
+        for user in users:
+            permissions.invalidate_cached_permissions(user)
+        AssignmentParticipation.objects.filter(user__in=users, assignment__courses__in=courses).update_eligibility()
+        return updated
+
+
 class Participation(models.Model):
     """Participation.
 
@@ -632,6 +708,7 @@ class Participation(models.Model):
     The user is now linked to the course, and has a set of permissions
     associated with its role.
     """
+    objects = ParticipationQuerySet.as_manager()
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
@@ -670,6 +747,51 @@ class Participation(models.Model):
             self.user.to_string(user=user), self.course.to_string(user=user), self.role.to_string(user=user))
 
 
+@receiver(models.signals.post_save, sender=Role)
+@receiver(models.signals.post_delete, sender=Role)
+@receiver(models.signals.m2m_changed, sender=Course.users.through)
+def invalidate_cached_role_permissions(sender, instance, **kwargs):
+    permissions.invalidate_cached_permissions()
+
+
+@receiver(models.signals.post_save, sender=Participation)
+@receiver(models.signals.post_delete, sender=Participation)
+def invalidate_cached_participation_permissions(sender, instance, **kwargs):
+    permissions.invalidate_cached_permissions(instance.user_id)
+
+
+def has_role_in_assignment(user, assignment, **permissions):
+    """Expression for whether the user has a role with all of the given permissions in any course of the assignment.
+
+    assignment can be an OuterRef to the assignment, so the expression can be used in an annotation.
+    """
+    return Exists(Role.objects.filter(role__user=user, course__assignment=assignment, **permissions))
+
+
+class AssignmentQuerySet(models.QuerySet):
+    def viewable_by(self, user):
+        """Filter on the assignments the user can view, following the rules of User.can_view."""
+        if user.is_superuser:
+            return self.all()
+
+        return self.annotate(
+            viewer_is_participant=Exists(Participation.objects.filter(user=user, course__assignment=OuterRef('pk'))),
+            viewer_can_have_journal=has_role_in_assignment(user, OuterRef('pk'), can_have_journal=True),
+            viewer_can_view_all_journals=has_role_in_assignment(user, OuterRef('pk'), can_view_all_journals=True),
+            viewer_can_view_unpublished=has_role_in_assignment(
+                user, OuterRef('pk'), can_view_unpublished_assignment=True),
+            viewer_is_in_assigned_group=Exists(
+                Group.objects.filter(assignment=OuterRef('pk'), participation__user=user)),
+            has_assigned_groups=Exists(Group.objects.filter(assignment=OuterRef('pk'))),
+        ).filter(
+            # Students need to be in one of the assigned groups, if there are any
+            ~Q(viewer_can_have_journal=True, viewer_can_view_all_journals=False, has_assigned_groups=True,
+               viewer_is_in_assigned_group=False),
+            Q(is_published=True) | Q(viewer_can_view_unpublished=True),
+            viewer_is_participant=True,
+        )
+
+
 class Assignment(models.Model):
     """Assignment.
 
@@ -684,6 +806,8 @@ class Assignment(models.Model):
     - lti_id_set: (optional) the set of VLE assignment lti_id_set which permit basic access.
     """
 
+    objects = AssignmentQuerySet.as_manager()
+
     name = models.TextField()
     description = models.TextField(
         null=True,
@@ -823,35 +947,49 @@ class Assignment(models.Model):
         return courses.first()
 
     def get_active_course(self, user):
-        """"Query for retrieving the course which is most relevant to the assignment."""
-        # If there are no courses connected, return none
-        if not self.courses:
-            return None
+        """"Query for retrieving the course which is most relevant to the assignment.
 
-        # Get matching LTI course if possible
-        active_courses = self.courses.filter(assignment_lti_id_set__contains=[self.active_lti_id])
-        for course in active_courses:
-            if user.can_view(course):
-                return course
-
-        # Else get course that started the most recent
-        most_recent_courses = self.courses.filter(startdate__lte=timezone.now()).order_by('-startdate')
-        for course in most_recent_courses:
-            if user.can_view(course):
-                return course
+        Of the courses of the assignment the user can view, this is the course matching the active LTI id, else the
+        course that started the most recent, else the course that starts the soonest, else the first course without
+        start date. The course is selected with a single query and reused for the remainder of the request.
+        """
+        return request_cache.get_or_set(
+            self._active_course_key(user), lambda: Assignment.get_active_courses([self], user)[self.pk])
 
-        # Else get the course that starts the soonest
-        starts_first_courses = self.courses.filter(startdate__gt=timezone.now()).order_by('startdate')
-        for course in starts_first_courses:
-            if user.can_view(course):
-                return course
+    def _active_course_key(self, user):
+        return ('active_course', self.pk, self.active_lti_id, user.pk)
 
-        # Else get the first course without start date
-        for course in self.courses.filter(startdate__isnull=True).order_by('pk'):
-            if user.can_view(course):
-                return course
+    @staticmethod
+    def get_active_courses(assignments, user):
+        """Get the active course of each of the assignments, see get_active_course.
 
-        return None
+        The courses are selected with a single query and reused for the remainder of the request. Returns a dict
+        mapping the pk of each assignment to its active course, which is None when the user can view none of its
+        courses.
+        """
+        assignments = list(assignments)
+        now = timezone.now()
+        links = Assignment.courses.through.objects.filter(assignment__in=assignments)
+        if not user.is_superuser:
+            links = links.filter(course__participation__user=user)
+
+        priorities = [When(assignment=assignment, course__assignment_lti_id_set__contains=[assignment.active_lti_id],
+                           then=0) for assignment in assignments if assignment.active_lti_id is not None]
+        priorities += [When(course__startdate__lte=now, then=1), When(course__startdate__gt=now, then=2)]
+        priority = Case(*priorities, default=3, output_field=IntegerField())
+
+        links = links.select_related('course').annotate(priority=priority).order_by(
+            'assignment',
+            'priority',
+            Case(When(priority=1, then=F('course__startdate'))).desc(nulls_last=True),
+            Case(When(priority=2, then=F('course__startdate'))).asc(nulls_last=True),
+            'course').distinct('assignment')
+        courses = {link.assignment_id: link.course for link in links}
+
+        for assignment in assignments:
+            courses.setdefault(assignment.pk, None)
+            request_cache.get_or_set(assignment._active_course_key(user), lambda: courses[assignment.pk])
+        return courses
 
     def get_lti_id_from_course(self, course):
         """Gets the assignment lti_id that belongs to the course assignment pair if it exists."""
@@ -893,12 +1031,53 @@ class Assignment(models.Model):
         return "{} ({})".format(self.name, self.pk)
 
 
+@receiver(models.signals.m2m_changed, sender=Assignment.courses.through)
+def invalidate_cached_assignment_courses(sender, instance, **kwargs):
+    permissions.invalidate_cached_permissions()
+
+
+class AssignmentParticipationQuerySet(models.QuerySet):
+    @staticmethod
+    def _eligible_expression():
+        """Expression for whether the user of an assignment participation can have a journal in the assignment.
+
+        This is the case when the user has a role with can_have_journal in one of the courses of the assignment, and
+        is a member of one of the assigned groups of the assignment through that course, if it has any.
+        """
+        return Exists(Participation.objects.filter(
+            Q(course__assignment__assigned_groups=None) | Q(groups__assignment=OuterRef('assignment')),
+            user=OuterRef('user'), course__assignment=OuterRef('assignment'), role__can_have_journal=True,
+        ))
+
+    def update(self, **kwargs):
+        """Update the assignment participations, invalidating the permissions of the users when their journals change.
+
+        Removing authors from a journal updates their assignment participations without sending signals.
+        """
+        users = list(self.values_list('user', flat=True)) if 'journal' in kwargs else []
+        updated = super(AssignmentParticipationQuerySet, self).update(**kwargs)
+        for user in users:
+            permissions.invalidate_cached_permissions(user)
+        return updated
+
+    def update_eligibility(self):
+        """Recompute whether the users of the assignment participations can have a journal, in a single query."""
+        return AssignmentParticipation.objects.filter(pk__in=self.values('pk')).update(
+            eligible=self._eligible_expression())
+
+    def outdated_eligibility(self):
+        """Get the assignment participations of which the stored eligibility differs from the participations."""
+        return AssignmentParticipation.objects.filter(pk__in=self.values('pk')).annotate(
+            expected_eligible=self._eligible_expression()).exclude(eligible=F('expected_eligible'))
+
+
 class AssignmentParticipation(models.Model):
     """AssignmentParticipation
 
     A user that is connected to an assignment
     this can then be used as a participation for a journal
     """
+    objects = AssignmentParticipationQuerySet.as_manager()
 
     journal = models.ForeignKey(
         'Journal',
@@ -920,12 +1099,22 @@ class AssignmentParticipation(models.Model):
     sourcedid = models.TextField(null=True)
     grade_url = models.TextField(null=True)
 
+    # Whether the user can have a journal in the assignment, maintained by update_eligibility
+    eligible = models.BooleanField(
+        default=False,
+    )
+
     def needs_lti_link(self):
         return self.assignment.active_lti_id is not None and self.sourcedid is None
 
     def save(self, *args, **kwargs):
         is_new = self._state.adding
         super(AssignmentParticipation, self).save(*args, **kwargs)
+        # A new or outdated instance may have written an old eligibility, so recompute it
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'eligible' in update_fields:
+            AssignmentParticipation.objects.filter(pk=self.pk).update_eligibility()
+            self.refresh_from_db(fields=['eligible'])
 
         # Instance is being created (not modified)
         if is_new:
@@ -943,15 +1132,144 @@ class AssignmentParticipation(models.Model):
         """A class for meta data.
 
         - unique_together: assignment and author must be unique together.
+        - indexes: the journals of eligible users, used by the default journal manager.
         """
         unique_together = ('assignment', 'user',)
+        indexes = [
+            models.Index(fields=['journal'], condition=Q(eligible=True), name='eligible_journal_idx'),
+        ]
+
+
+@receiver(models.signals.post_save, sender=AssignmentParticipation)
+@receiver(models.signals.post_delete, sender=AssignmentParticipation)
+def invalidate_cached_author_permissions(sender, instance, **kwargs):
+    # The authors of a journal can view it
+    permissions.invalidate_cached_permissions(instance.user_id)
+
+
+@receiver(models.signals.post_save, sender=Participation)
+@receiver(models.signals.post_delete, sender=Participation)
+def update_participation_eligibility(sender, instance, **kwargs):
+    AssignmentParticipation.objects.filter(
+        user=instance.user_id, assignment__courses=instance.course_id).update_eligibility()
+
+
+@receiver(models.signals.m2m_changed, sender=Participation.groups.through)
+def update_participation_groups_eligibility(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        AssignmentParticipation.objects.filter(assignment__courses=instance.course_id).update_eligibility()
+    else:
+        AssignmentParticipation.objects.filter(
+            user=instance.user_id, assignment__courses=instance.course_id).update_eligibility()
+
+
+@receiver(models.signals.post_save, sender=Role)
+@receiver(models.signals.post_delete, sender=Role)
+@receiver(models.signals.post_delete, sender=Group)
+def update_course_eligibility(sender, instance, **kwargs):
+    # Deleting a group removes its memberships and assignments without sending m2m_changed
+    AssignmentParticipation.objects.filter(assignment__courses=instance.course_id).update_eligibility()
+
+
+@receiver(models.signals.m2m_changed, sender=Assignment.courses.through)
+@receiver(models.signals.m2m_changed, sender=Assignment.assigned_groups.through)
+def update_assignment_eligibility(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        assignment_participations = AssignmentParticipation.objects.filter(assignment=instance)
+    elif isinstance(instance, Course):
+        assignment_participations = AssignmentParticipation.objects.filter(user__participation__course=instance)
+    else:
+        assignment_participations = AssignmentParticipation.objects.filter(assignment__courses=instance.course_id)
+    if reverse and pk_set:
+        assignment_participations = assignment_participations.filter(assignment__in=pk_set)
+    assignment_participations.update_eligibility()
+
+
+class JournalQuerySet(models.QuerySet):
+    @staticmethod
+    def grade_expression():
+        """Expression for the grade of a journal, rounded like Journal.get_grade."""
+        return Func(F('bonus_points') + F('published_points'), template='ROUND((%(expressions)s)::numeric, 2)',
+                    output_field=FloatField())
+
+    @staticmethod
+    def _summary_expressions():
+        """Expressions computing the summary fields of a journal from its entries."""
+        nodes = Node.objects.filter(journal=OuterRef('pk'), entry__isnull=False).order_by().values('journal')
+
+        def aggregate(expression, output_field, default=0):
+            return Coalesce(Subquery(nodes.annotate(value=expression).values('value'), output_field=output_field),
+                            default)
+
+        return {
+            'published_points': aggregate(
+                Sum('entry__grade__grade', filter=Q(entry__grade__published=True)), FloatField()),
+            'submitted_count': aggregate(Count('pk'), IntegerField()),
+            'graded_count': aggregate(Count('pk', filter=Q(entry__grade__grade__isnull=False)), IntegerField()),
+            'published_count': aggregate(Count('pk', filter=Q(entry__grade__published=True)), IntegerField()),
+            'unpublished_count': aggregate(
+                Count('pk', filter=Q(entry__grade__published=False, entry__grade__grade__isnull=False)),
+                IntegerField()),
+            'last_activity': Subquery(
+                nodes.annotate(value=Greatest(Max('entry__last_edited'), Max('entry__grade__creation_date')))
+                .values('value'), output_field=models.DateTimeField()),
+        }
+
+    def update_summaries(self):
+        """Recompute the summary fields of the journals from their entries, in a single query."""
+        return Journal.all_objects.filter(pk__in=self.values('pk')).update(**self._summary_expressions())
+
+    def outdated_summaries(self):
+        """Get the journals of which the stored summary differs from their entries."""
+        expected = {'expected_' + field: expression for field, expression in self._summary_expressions().items()}
+        # Compare the last activity including missing values
+        never = Value(timezone.datetime.min, output_field=models.DateTimeField())
+        expected['expected_last_activity'] = Coalesce(expected['expected_last_activity'], never)
+
+        outdated = ~Q(stored_last_activity=F('expected_last_activity'))
+        for field in Journal.SUMMARY_FIELDS:
+            if field != 'last_activity':
+                outdated |= ~Q(**{field: F('expected_' + field)})
+        return Journal.all_objects.filter(pk__in=self.values('pk')).annotate(
+            stored_last_activity=Coalesce('last_activity', never), **expected).filter(outdated)
+
+    def eligible(self):
+        """Filter on the journals of group assignments and the journals with an eligible author.
+
+        The eligibility of the authors is stored on their assignment participations, so this is a single semi-join.
+        """
+        return self.filter(
+            Q(assignment__is_group_assignment=True) |
+            Q(pk__in=AssignmentParticipation.objects.filter(eligible=True).values('journal')))
 
+    def needs_lms_passback(self):
+        """Filter on the journals with an author linked to the LMS, of which the status in the LMS is outdated.
 
-class JournalManager(models.Manager):
-    def get_queryset(self):
-        """Filter on only journals with can_have_journal and that are in the assigned to groups"""
-        query = super(JournalManager, self).get_queryset()
-        return query.annotate(
+        These journals have entries that were not sent, or of which the grade was published after they were sent, or
+        a grade that differs from the grade last sent. The entries are found through a partial index on vle_coupling.
+        The last sent grade is rounded to 2 decimals, so the grade only differs when it is more than half a hundredth
+        away from it.
+        """
+        unsent = Entry.objects.exclude(vle_coupling=Entry.LINK_COMPLETE).filter(
+            Q(vle_coupling__in=[Entry.NEEDS_SUBMISSION, Entry.NEEDS_GRADE_PASSBACK]) |
+            Q(vle_coupling=Entry.SENT_SUBMISSION, grade__published=True))
+        linked_authors = AssignmentParticipation.objects.filter(sourcedid__isnull=False, grade_url__isnull=False)
+        return self.filter(pk__in=linked_authors.values('journal')).annotate(
+            lms_grade_difference=Abs(F('LMS_grade') - F('bonus_points') - F('published_points')),
+        ).filter(
+            Q(pk__in=Node.objects.filter(entry__in=unsent).values('journal')) |
+            Q(lms_grade_difference__gt=0.005))
+
+    def eligible_by_joins(self):
+        """Filter on the same journals as eligible, by joining the participations of the authors.
+
+        This does not rely on the stored eligibility, it is used to verify and benchmark it.
+        """
+        return self.annotate(
             p_user=F('assignment__courses__participation__user'),
             p_group=F('assignment__courses__participation__groups'),
             can_have_journal=F('assignment__courses__participation__role__can_have_journal')
@@ -968,6 +1286,12 @@ class JournalManager(models.Manager):
         ).distinct().order_by('pk')
 
 
+class JournalManager(models.Manager.from_queryset(JournalQuerySet)):
+    def get_queryset(self):
+        """Filter on only journals with can_have_journal and that are in the assigned to groups"""
+        return super(JournalManager, self).get_queryset().eligible().order_by('pk')
+
+
 class Journal(models.Model):
     """Journal.
 
@@ -977,7 +1301,7 @@ class Journal(models.Model):
     - user: a foreign key linked to a user.
     """
     UNLIMITED = 0
-    all_objects = models.Manager()
+    all_objects = JournalQuerySet.as_manager()
     objects = JournalManager()
 
     assignment = models.ForeignKey(
@@ -1005,19 +1329,49 @@ class Journal(models.Model):
         default=False,
     )
 
-    LMS_grade = models.IntegerField(
+    # The grade last sent to the LMS, rounded like get_grade
+    LMS_grade = models.FloatField(
         default=0,
     )
 
+    # Summary of the entries and their grades, kept up to date by Journal.all_objects.update_summaries()
+    SUMMARY_FIELDS = ['published_points', 'submitted_count', 'graded_count', 'published_count', 'unpublished_count',
+                      'last_activity']
+    published_points = models.FloatField(
+        default=0,
+    )
+    submitted_count = models.IntegerField(
+        default=0,
+    )
+    graded_count = models.IntegerField(
+        default=0,
+    )
+    published_count = models.IntegerField(
+        default=0,
+    )
+    unpublished_count = models.IntegerField(
+        default=0,
+    )
+    last_activity = models.DateTimeField(
+        null=True,
+    )
+
     # NOTE: Any suggestions for a clear warning msg for all cases?
     outdated_link_warning_msg = 'This journal has an outdated LMS uplink and can no longer be edited. Visit  ' \
         + 'eJournal from an updated LMS connection.'
 
-    def get_grade(self):
-        return round(self.bonus_points + (
-            self.node_set.filter(entry__grade__published=True)
-            .values('entry__grade__grade')
-            .aggregate(Sum('entry__grade__grade'))['entry__grade__grade__sum'] or 0), 2)
+    def get_grade(self, use_summary=False):
+        """Get the grade of the journal, aggregated from its published grades.
+
+        With use_summary the stored published points of the instance are used instead, which saves a query when
+        serializing many journals, but are only up to date when the journal was loaded after its last grade.
+        """
+        if use_summary:
+            published_points = self.published_points
+        else:
+            published_points = self.node_set.filter(entry__grade__published=True) \
+                .aggregate(Sum('entry__grade__grade'))['entry__grade__grade__sum'] or 0
+        return round(self.bonus_points + published_points, 2)
 
     def needs_lti_link(self):
         return any(author.needs_lti_link() for author in self.authors.all())
@@ -1030,9 +1384,10 @@ class Journal(models.Model):
 
     def get_image(self):
         if self.image is None:
-            user_with_pic = self.authors.all().exclude(user__profile_picture=settings.DEFAULT_PROFILE_PICTURE).first()
-            if user_with_pic is not None:
-                return user_with_pic.user.profile_picture
+            # Iterate over all authors so prefetched authors are used
+            for author in sorted(self.authors.all(), key=lambda author: author.pk):
+                if author.user.profile_picture != settings.DEFAULT_PROFILE_PICTURE:
+                    return author.user.profile_picture
 
             return settings.DEFAULT_PROFILE_PICTURE
         return self.image
@@ -1057,6 +1412,11 @@ class Journal(models.Model):
             if self.assignment.is_group_assignment:
                 self.name = 'Journal {}'.format(Journal.objects.filter(assignment=self.assignment).count() + 1)
         super(Journal, self).save(*args, **kwargs)
+        # An outdated instance may have written an old summary, so recompute it from the entries
+        update_fields = kwargs.get('update_fields')
+        if not is_new and (update_fields is None or set(update_fields) & set(self.SUMMARY_FIELDS)):
+            Journal.all_objects.filter(pk=self.pk).update_summaries()
+            self.refresh_from_db(fields=self.SUMMARY_FIELDS)
         # On create add preset nodes
         if is_new:
             preset_nodes = self.assignment.format.presetnode_set.all()
@@ -1151,6 +1511,13 @@ class Node(models.Model):
         return "Node"
 
 
+@receiver(models.signals.post_save, sender=Node)
+@receiver(models.signals.post_delete, sender=Node)
+def update_journal_summary_on_node_change(sender, instance, **kwargs):
+    if instance.entry_id is not None:
+        Journal.all_objects.filter(pk=instance.journal_id).update_summaries()
+
+
 class Format(models.Model):
     """Format.
 
@@ -1295,6 +1662,32 @@ class Entry(models.Model):
     def to_string(self, user=None):
         return "Entry"
 
+    class Meta:
+        """A class for meta data.
+
+        - indexes: the entries that are not yet LINK_COMPLETE, of which something still needs to be sent to the LMS.
+        """
+        indexes = [
+            models.Index(fields=['vle_coupling'], condition=~Q(vle_coupling='Everything is sent to VLE'),
+                         name='entry_vle_coupling_idx'),
+        ]
+
+
+@receiver(models.signals.post_save, sender=Entry)
+def update_journal_summary_on_entry_save(sender, instance, **kwargs):
+    Journal.all_objects.filter(node__entry=instance).update_summaries()
+
+
+@receiver(models.signals.pre_delete, sender=Entry)
+def remember_journal_of_deleted_entry(sender, instance, **kwargs):
+    instance.summary_journal_pk = Node.objects.filter(entry=instance).values_list('journal', flat=True).first()
+
+
+@receiver(models.signals.post_delete, sender=Entry)
+def update_journal_summary_on_entry_delete(sender, instance, **kwargs):
+    if getattr(instance, 'summary_journal_pk', None) is not None:
+        Journal.all_objects.filter(pk=instance.summary_journal_pk).update_summaries()
+
 
 class Grade(models.Model):
     """Grade.
@@ -1334,11 +1727,157 @@ class Grade(models.Model):
         return "Grade"
 
 
+@receiver(models.signals.post_save, sender=Grade)
+def update_journal_summary_on_grade_save(sender, instance, **kwargs):
+    Journal.all_objects.filter(node__entry__grade=instance).update_summaries()
+
+
+@receiver(models.signals.post_delete, sender=Grade)
+def update_journal_summary_on_grade_delete(sender, instance, **kwargs):
+    Journal.all_objects.filter(node__entry=instance.entry_id).update_summaries()
+
+
+class GradingQueueQuerySet(models.QuerySet):
+    @staticmethod
+    def _queued_entries(entries):
+        """The entries that need marking: submitted in a journal, but without a published grade."""
+        return Entry.objects.filter(pk__in=entries, node__isnull=False).filter(
+            Q(grade__isnull=True) | Q(grade__grade__isnull=True) | Q(grade__published=False))
+
+    def refresh(self, entries):
+        """Recompute the queue items of the given entries (a list of pks or a queryset) from the entries themselves."""
+        with transaction.atomic():
+            GradingQueueItem.objects.filter(entry__in=entries).delete()
+            GradingQueueItem.objects.bulk_create([
+                GradingQueueItem(
+                    entry_id=entry, journal_id=journal, assignment_id=assignment, submitted=submitted,
+                    state=GradingQueueItem.UNGRADED if grade is None else GradingQueueItem.UNPUBLISHED)
+                for entry, journal, assignment, submitted, grade in self._queued_entries(entries).values_list(
+                    'pk', 'node__journal', 'node__journal__assignment', 'last_edited', 'grade__grade')
+            ])
+
+    def outdated(self):
+        """Get the pks of the entries of which the queue item is missing, superfluous or differs from the entry."""
+        queued = set(self._queued_entries(Entry.objects.values('pk')).annotate(
+            state=Case(When(grade__grade__isnull=True, then=Value(GradingQueueItem.UNGRADED)),
+                       default=Value(GradingQueueItem.UNPUBLISHED), output_field=models.TextField()),
+        ).values_list('pk', 'node__journal', 'node__journal__assignment', 'last_edited', 'state'))
+        stored = set(GradingQueueItem.objects.values_list('entry', 'journal', 'assignment', 'submitted', 'state'))
+        return sorted({item[0] for item in queued ^ stored})
+
+    def gradable_by(self, user):
+        """Filter on the items of the journals in the courses where the user can grade."""
+        items = self.filter(journal__in=Journal.objects.values('pk'))
+        if user.is_superuser:
+            return items
+        return items.filter(
+            assignment__in=Assignment.objects.filter(
+                courses__in=permissions.courses_with_permission(user, 'can_grade')).values('pk'))
+
+    def in_group(self, group):
+        """Filter on the items of journals with an author in the group."""
+        return self.filter(journal__in=Journal.objects.filter(
+            authors__user__participation__groups=group).values('pk'))
+
+
+class GradingQueueItem(models.Model):
+    """GradingQueueItem.
+
+    An entry that needs marking, kept up to date by GradingQueueItem.objects.refresh() on entry, node and grade
+    writes. It is either ungraded, or graded without publishing the grade.
+    """
+    UNGRADED = 'ungraded'
+    UNPUBLISHED = 'unpublished'
+    STATES = (
+        (UNGRADED, 'ungraded'),
+        (UNPUBLISHED, 'unpublished'),
+    )
+
+    objects = GradingQueueQuerySet.as_manager()
+
+    entry = models.OneToOneField(
+        'Entry',
+        primary_key=True,
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    assignment = models.ForeignKey(
+        'Assignment',
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    journal = models.ForeignKey(
+        'Journal',
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    submitted = models.DateTimeField()
+    state = models.TextField(
+        choices=STATES,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['assignment', 'submitted'], name='grading_queue_assignment_idx'),
+        ]
+
+    def to_string(self, user=None):
+        return "Grading queue item"
+
+
+@receiver(models.signals.post_save, sender=Entry)
+@receiver(models.signals.post_save, sender=Grade)
+def update_grading_queue_on_entry_change(sender, instance, **kwargs):
+    GradingQueueItem.objects.refresh([instance.pk if sender is Entry else instance.entry_id])
+
+
+@receiver(models.signals.post_save, sender=Node)
+@receiver(models.signals.post_delete, sender=Node)
+def update_grading_queue_on_node_change(sender, instance, **kwargs):
+    if instance.entry_id is not None:
+        GradingQueueItem.objects.refresh([instance.entry_id])
+
+
+class PassbackOutboxQuerySet(models.QuerySet):
+    def mark_dirty(self, journal_pks):
+        """Record that the status of the journals needs to be sent to the LMS.
+
+        Journals that are already waiting keep their place, so marking is idempotent and never delays a send.
+        """
+        PassbackOutbox.objects.bulk_create(
+            [PassbackOutbox(journal_id=pk) for pk in set(journal_pks)], ignore_conflicts=True)
+
+
+class PassbackOutbox(models.Model):
+    """PassbackOutbox.
+
+    A journal of which the status still needs to be sent to the LMS, drained by the drain_passback_outbox beat.
+    - dirty_since: when the journal was first changed after its last send.
+    """
+    objects = PassbackOutboxQuerySet.as_manager()
+
+    journal = models.OneToOneField(
+        'Journal',
+        primary_key=True,
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    dirty_since = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+    )
+
+    def to_string(self, user=None):
+        return "Passback outbox"
+
+
 class Counter(models.Model):
     """Counter.
 
     A single counter class which can be used to keep track of incremental values
-    which do not belong to another object like the message ID for LTI messages.
+    which do not belong to another object.
+    Message IDs for LTI messages are allocated from the VLE_message_id_seq sequence instead, the message_id counter
+    only records where that sequence continues when the migration creating it is reversed.
     """
 
     name = models.TextField(
@@ -1429,6 +1968,14 @@ class Field(models.Model):
         return "{} ({})".format(self.title, self.id)
 
 
+@receiver(models.signals.post_save, sender=Template)
+@receiver(models.signals.post_delete, sender=Template)
+@receiver(models.signals.post_save, sender=Field)
+@receiver(models.signals.post_delete, sender=Field)
+def invalidate_cached_templates(sender, instance, **kwargs):
+    template_cache.invalidate()
+
+
 class Content(models.Model):
     """Content.
 
@@ -1464,7 +2011,6 @@ class Comment(models.Model):
     Comments contain the comments given to the entries.
     It is linked to a single entry with a single author and the comment text.
     """
-
     entry = models.ForeignKey(
         'Entry',
         on_delete=models.CASCADE
@@ -1515,3 +2061,129 @@ class Comment(models.Model):
 
     def to_string(self, user=None):
         return "Comment"
+
+
+def _entry_journals(entry_ids):
+    return Node.objects.filter(entry__in=entry_ids).values_list('journal', flat=True)
+
+
+def _course_formats(course_ids):
+    return Assignment.objects.filter(courses__in=course_ids).values_list('format', flat=True)
+
+
+@receiver(models.signals.post_save, sender=Journal)
+@receiver(models.signals.post_delete, sender=Journal)
+def bump_journal_etag(sender, instance, **kwargs):
+    etags.bump_journals([instance.pk])
+
+
+@receiver(models.signals.post_save, sender=Node)
+@receiver(models.signals.post_delete, sender=Node)
+@receiver(models.signals.post_save, sender=AssignmentParticipation)
+@receiver(models.signals.post_delete, sender=AssignmentParticipation)
+def bump_journal_etag_of_related(sender, instance, **kwargs):
+    etags.bump_journals([instance.journal_id])
+
+
+@receiver(models.signals.post_save, sender=Entry)
+def bump_entry_journal_etag(sender, instance, **kwargs):
+    etags.bump_journals(_entry_journals([instance.pk]))
+
+
+@receiver(models.signals.post_delete, sender=Entry)
+def bump_deleted_entry_journal_etag(sender, instance, **kwargs):
+    etags.bump_journals([getattr(instance, 'summary_journal_pk', None)])
+
+
+@receiver(models.signals.post_save, sender=Content)
+@receiver(models.signals.post_delete, sender=Content)
+@receiver(models.signals.post_save, sender=Grade)
+@receiver(models.signals.post_delete, sender=Grade)
+@receiver(models.signals.post_save, sender=Comment)
+@receiver(models.signals.post_delete, sender=Comment)
+def bump_entry_content_journal_etag(sender, instance, **kwargs):
+    etags.bump_journals(_entry_journals([instance.entry_id]))
+
+
+@receiver(models.signals.post_save, sender=User)
+def bump_user_journal_etags(sender, instance, **kwargs):
+    # The names and pictures of the authors are part of their journals
+    etags.bump_journals(AssignmentParticipation.objects.filter(user=instance).values_list('journal', flat=True))
+
+
+def _participation_journals(participations):
+    # The role and groups of the authors in the course of the participation are part of their journals
+    return AssignmentParticipation.objects.filter(
+        user__participation__in=participations, assignment__courses=F('user__participation__course'),
+    ).values_list('journal', flat=True)
+
+
+@receiver(models.signals.post_save, sender=Participation)
+@receiver(models.signals.post_delete, sender=Participation)
+def bump_participation_journal_etags(sender, instance, **kwargs):
+    etags.bump_journals(AssignmentParticipation.objects.filter(
+        user=instance.user_id, assignment__courses=instance.course_id).values_list('journal', flat=True))
+
+
+@receiver(models.signals.m2m_changed, sender=Participation.groups.through)
+def bump_participation_groups_journal_etags(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        etags.bump_journals(_participation_journals([instance.pk]))
+    elif pk_set:
+        etags.bump_journals(_participation_journals(pk_set))
+    else:
+        etags.bump_journals(_participation_journals(Participation.objects.filter(course=instance.course_id)))
+
+
+@receiver(models.signals.post_save, sender=Group)
+@receiver(models.signals.pre_delete, sender=Group)
+def bump_group_journal_etags(sender, instance, **kwargs):
+    etags.bump_journals(_participation_journals(Participation.objects.filter(groups=instance)))
+
+
+@receiver(models.signals.post_save, sender=Format)
+def bump_format_etag(sender, instance, **kwargs):
+    etags.bump_formats([instance.pk])
+
+
+@receiver(models.signals.post_save, sender=Assignment)
+@receiver(models.signals.post_save, sender=PresetNode)
+@receiver(models.signals.post_delete, sender=PresetNode)
+@receiver(models.signals.post_save, sender=Template)
+@receiver(models.signals.post_delete, sender=Template)
+def bump_format_etag_of_related(sender, instance, **kwargs):
+    etags.bump_formats([instance.format_id])
+
+
+@receiver(models.signals.post_save, sender=Field)
+@receiver(models.signals.post_delete, sender=Field)
+def bump_field_format_etag(sender, instance, **kwargs):
+    etags.bump_formats(Template.objects.filter(pk=instance.template_id).values_list('format', flat=True))
+
+
+@receiver(models.signals.post_save, sender=Course)
+def bump_course_format_etags(sender, instance, **kwargs):
+    etags.bump_formats(_course_formats([instance.pk]))
+
+
+@receiver(models.signals.post_save, sender=Group)
+@receiver(models.signals.post_delete, sender=Group)
+def bump_group_format_etags(sender, instance, **kwargs):
+    etags.bump_formats(_course_formats([instance.course_id]))
+
+
+@receiver(models.signals.m2m_changed, sender=Assignment.courses.through)
+@receiver(models.signals.m2m_changed, sender=Assignment.assigned_groups.through)
+def bump_assignment_format_etags(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        etags.bump_formats([instance.format_id])
+    elif pk_set:
+        etags.bump_formats(Assignment.objects.filter(pk__in=pk_set).values_list('format', flat=True))
+    elif isinstance(instance, Course):
+        etags.bump_formats(_course_formats([instance.pk]))
+    else:
+        etags.bump_formats(_course_formats([instance.course_id]))
@@ -3,12 +3,119 @@ permissions.py.
 
 All the permission functions.
 """
+import uuid
+import zlib
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import BoolOr
+from django.core.cache import cache
 from django.db.models import Q
 
 import VLE.models
+from VLE.utils import request_cache
 from VLE.utils.error_handling import VLEProgrammingError
 
 
+def _cache_version(*scope):
+    """Get the version token of the shared permission cache, global or for the given scope (e.g. a user).
+
+    Invalidating replaces the token with a new random one, so stale entries are never read again and simply expire.
+    """
+    key = ':'.join(['permissions', 'version'] + [str(part) for part in scope])
+    return cache.get_or_set(key, lambda: uuid.uuid4().hex, None)
+
+
+def cache_version(user):
+    """Get a token that changes whenever the permissions of the user might have changed."""
+    return '{}:{}'.format(_cache_version(), _cache_version('user', user.pk))
+
+
+def invalidate_cached_permissions(user_pk=None):
+    """Invalidate the cached permissions of the user with the given pk, or of all users when no pk is passed."""
+    scope = ['user', user_pk] if user_pk is not None else []
+    cache.set(':'.join(['permissions', 'version'] + [str(part) for part in scope]), uuid.uuid4().hex, None)
+    request_cache.clear()
+
+
+def _count(statistic):
+    key = 'permissions:' + statistic
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def permission_cache_stats():
+    """Get the number of hits and misses of the shared permission cache."""
+    return {statistic: cache.get('permissions:' + statistic, 0) for statistic in ['hits', 'misses']}
+
+
+def _shared_cached(key, load):
+    """Get the value for the key from the shared cache, loading and storing it on a miss.
+
+    When the cache is not shared between processes, invalidations would not reach the other processes, so the value
+    is always loaded.
+    """
+    if not settings.SHARED_CACHE:
+        return load()
+    key = 'permissions:{}:{}:{}'.format(
+        zlib.crc32(','.join(VLE.models.Role.PERMISSIONS).encode()), _cache_version(), key)
+    value = cache.get(key)
+    if value is None:
+        _count('misses')
+        value = load()
+        cache.set(key, value, settings.PERMISSION_CACHE_TIMEOUT)
+    else:
+        _count('hits')
+    return value
+
+
+def permission_matrix(user):
+    """Get the permissions of the user in every course they participate in.
+
+    Returns a dict mapping the pk of each course to a bitset of the permissions of the user's role in that course,
+    with bit i set when the role has Role.PERMISSIONS[i]. The matrix is loaded with a single query, shared between
+    requests through the cache and reused for the remainder of the request.
+    """
+    def load():
+        fields = ['role__' + permission for permission in VLE.models.Role.PERMISSIONS]
+        matrix = {}
+        for course, *flags in VLE.models.Participation.objects.filter(user=user).values_list('role__course', *fields):
+            matrix[course] = sum(1 << i for i, flag in enumerate(flags) if flag)
+        return matrix
+
+    return request_cache.get_or_set(
+        ('permission_matrix', user.pk),
+        lambda: _shared_cached('matrix:{}:{}'.format(_cache_version('user', user.pk), user.pk), load))
+
+
+def assignment_course_ids(assignment):
+    """Get the pks of the courses the assignment is linked to."""
+    def load():
+        return frozenset(assignment.courses.values_list('pk', flat=True))
+
+    return request_cache.get_or_set(
+        ('assignment_courses', assignment.pk),
+        lambda: _shared_cached('assignment_courses:{}'.format(assignment.pk), load))
+
+
+def _has_permission_in_any(user, permission, course_ids):
+    bit = 1 << VLE.models.Role.PERMISSIONS.index(permission)
+    matrix = permission_matrix(user)
+    return any(matrix.get(course_id, 0) & bit for course_id in course_ids)
+
+
+def courses_with_permission(user, permission):
+    """Get the pks of the courses where the user has the given permission."""
+    return [course_id for course_id in permission_matrix(user) if _has_permission_in_any(user, permission, [course_id])]
+
+
+def is_participant_in_any(user, course_ids):
+    matrix = permission_matrix(user)
+    return any(course_id in matrix for course_id in course_ids)
+
+
 def has_general_permission(user, permission):
     """Check if the user has the needed "global" permission.
 
@@ -48,9 +155,7 @@ def has_course_permission(user, permission, course):
     if user.is_superuser:
         return True
 
-    return VLE.models.Role.objects.filter(
-        **{permission: True},
-        role__user=user, course=course).exists()
+    return _has_permission_in_any(user, permission, [course.pk])
 
 
 def has_assignment_permission(user, permission, assignment):
@@ -73,23 +178,48 @@ def has_assignment_permission(user, permission, assignment):
             return False
         return True
 
-    if permission == 'can_have_journal' and VLE.models.Role.objects.filter(can_view_all_journals=True,
-       role__user=user, course__in=assignment.courses.all()).exists():
+    course_ids = assignment_course_ids(assignment)
+    if permission == 'can_have_journal' and _has_permission_in_any(user, 'can_view_all_journals', course_ids):
         return False
 
-    return VLE.models.Role.objects.filter(
-        **{permission: True},
-        role__user=user, course__in=assignment.courses.all()).exists()
+    return _has_permission_in_any(user, permission, course_ids)
+
+
+def _supervised_courses(supervisor):
+    return [
+        course_id for course_id in permission_matrix(supervisor)
+        if _has_permission_in_any(supervisor, 'can_view_all_journals', [course_id]) or
+        _has_permission_in_any(supervisor, 'can_view_course_users', [course_id])
+    ]
 
 
 def is_user_supervisor_of(supervisor, user):
     """Checks whether the user is a participant in any of the assignments where the supervisor has the permission of
     can_view_course_users or where the supervisor is linked to the user through an assignment where the supervisor
     has the permission can_view_all_journals."""
-    return VLE.models.Role.objects.filter(
-        Q(can_view_all_journals=True) | Q(can_view_course_users=True),
-        role__user=supervisor,
-        course__in=VLE.models.Participation.objects.filter(user=user).values('course')).exists()
+    supervised_courses = _supervised_courses(supervisor)
+    if not supervised_courses:
+        return False
+
+    return VLE.models.Participation.objects.filter(user=user, course__in=supervised_courses).exists()
+
+
+def users_supervised_by(supervisor, user_ids):
+    """Get the pks of the users among user_ids of which the supervisor is a supervisor, see is_user_supervisor_of."""
+    supervised_courses = _supervised_courses(supervisor)
+    if not supervised_courses:
+        return set()
+
+    return set(VLE.models.Participation.objects.filter(
+        user__in=user_ids, course__in=supervised_courses).values_list('user', flat=True))
+
+
+def supervisors_of(user, user_ids):
+    """Get the pks of the users among user_ids that are a supervisor of the user, see is_user_supervisor_of."""
+    return set(VLE.models.Participation.objects.filter(
+        Q(role__can_view_all_journals=True) | Q(role__can_view_course_users=True),
+        user__in=user_ids, course__in=list(permission_matrix(user)),
+    ).values_list('user', flat=True))
 
 
 def can_edit(user, obj):
@@ -124,3 +254,43 @@ def serialize_course_permissions(user, course):
 
 def serialize_assignment_permissions(user, assignment):
     return {key: has_assignment_permission(user, key, assignment) for key in VLE.models.Role.ASSIGNMENT_PERMISSIONS}
+
+
+def serialize_user_permissions(user):
+    """Serialize the general permissions, the permissions in every course the user participates in and in every
+    assignment of those courses the user can grade or have a journal in.
+
+    The course and assignment permissions are retrieved with a single query, grouped by course and assignment.
+
+    Returns {
+        general: permissions
+        course{id}: permissions
+        assignment{id}: permissions
+    }
+    """
+    Role = VLE.models.Role
+    perms = {'general': serialize_general_permissions(user)}
+
+    rows = VLE.models.Participation.objects.filter(user=user).values('course', 'course__assignment').annotate(
+        **{permission: BoolOr('role__' + permission) for permission in Role.PERMISSIONS})
+
+    assignment_perms = {}
+    for row in rows:
+        if user.is_superuser:
+            row.update({permission: True for permission in Role.PERMISSIONS})
+
+        perms['course' + str(row['course'])] = {key: row[key] for key in Role.COURSE_PERMISSIONS}
+
+        if row['course__assignment'] is not None:
+            combined = assignment_perms.setdefault(
+                row['course__assignment'], dict.fromkeys(Role.ASSIGNMENT_PERMISSIONS, False))
+            for key in Role.ASSIGNMENT_PERMISSIONS:
+                combined[key] = combined[key] or row[key]
+
+    for assignment_id, combined in assignment_perms.items():
+        combined['can_have_journal'] = combined['can_have_journal'] and not combined['can_view_all_journals'] and \
+            not user.is_superuser
+        if combined['can_grade'] or combined['can_have_journal']:
+            perms['assignment' + str(assignment_id)] = combined
+
+    return perms
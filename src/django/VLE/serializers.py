@@ -4,25 +4,39 @@ Serializers.
 Functions to convert certain data to other formats.
 """
 from django.conf import settings
-from django.db.models import Min, Q
+from django.db.models import Min, Prefetch, Q
 from django.utils import timezone
 from rest_framework import serializers
 
 import VLE.permissions as permissions
 from VLE.models import (Assignment, AssignmentParticipation, Comment, Content, Course, Entry, Field, FileContext,
-                        Format, Grade, Group, Instance, Journal, Node, Participation, Preferences, PresetNode, Role,
-                        Template, User)
+                        Format, Grade, GradingQueueItem, Group, Instance, Journal, Node, Participation, Preferences,
+                        PresetNode, Role, Template, User)
 from VLE.utils import generic_utils as utils
+from VLE.utils import statistics, template_cache
 from VLE.utils.error_handling import VLEParticipationError, VLEProgrammingError
 
 
+class SparseFieldsetMixin:
+    """Serializer mixin limiting the serialized fields to the names passed as the fields argument, if any.
+
+    Fields that are left out are not computed at all. Unknown names are ignored.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super(SparseFieldsetMixin, self).__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 class InstanceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Instance
         fields = ('allow_standalone_registration', 'name')
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     role = serializers.SerializerMethodField()
     groups = serializers.SerializerMethodField()
     username = serializers.SerializerMethodField()
@@ -34,13 +48,52 @@ class UserSerializer(serializers.ModelSerializer):
                   'role', 'groups', 'is_test_student')
         read_only_fields = ('id', 'is_teacher', 'is_test_student')
 
+    @staticmethod
+    def setup_bulk_context(users, context):
+        """Add the participations of the users and their visibility to the viewer to the context.
+
+        Serializing the users with the returned context takes a fixed number of queries, instead of several queries
+        per user.
+        """
+        user_ids = [user.pk for user in users]
+        context = dict(context)
+
+        if context.get('course'):
+            context['participations'] = {
+                participation.user_id: participation for participation in Participation.objects.filter(
+                    course=context['course'], user__in=user_ids).select_related('role').prefetch_related('groups')
+            }
+
+        viewer = context.get('user')
+        if viewer:
+            if viewer.is_superuser:
+                supervised = viewable = set(user_ids)
+            else:
+                supervised = permissions.users_supervised_by(viewer, user_ids) | {viewer.pk}
+                coauthors = AssignmentParticipation.objects.filter(
+                    user__in=user_ids, journal__in=Journal.objects.filter(authors__user=viewer)
+                ).values_list('user', flat=True)
+                viewable = supervised | permissions.supervisors_of(viewer, user_ids) | set(coauthors)
+            context['supervised_users'] = supervised
+            context['viewable_users'] = viewable
+
+        return context
+
+    def _get_participation(self, user):
+        if 'participations' in self.context:
+            return self.context['participations'].get(user.pk)
+        try:
+            return Participation.objects.get(user=user, course=self.context['course'])
+        except Participation.DoesNotExist:
+            return None
+
     def get_role(self, user):
         if 'course' not in self.context or not self.context['course']:
             return None
-        try:
-            role = Participation.objects.get(user=user, course=self.context['course']).role
-        except Participation.DoesNotExist:
+        participation = self._get_participation(user)
+        if participation is None:
             return None
+        role = participation.role
         if role:
             return role.name
         else:
@@ -50,7 +103,10 @@ class UserSerializer(serializers.ModelSerializer):
         if 'user' not in self.context or not self.context['user']:
             return None
 
-        if not (self.context['user'].is_supervisor_of(user) or self.context['user'] == user):
+        if 'supervised_users' in self.context:
+            if user.pk not in self.context['supervised_users']:
+                return None
+        elif not (self.context['user'].is_supervisor_of(user) or self.context['user'] == user):
             return None
 
         return user.username
@@ -59,7 +115,10 @@ class UserSerializer(serializers.ModelSerializer):
         if 'user' not in self.context or not self.context['user']:
             return settings.DEFAULT_PROFILE_PICTURE
 
-        if not self.context['user'].can_view(user):
+        if 'viewable_users' in self.context:
+            if user.pk not in self.context['viewable_users']:
+                return settings.DEFAULT_PROFILE_PICTURE
+        elif not self.context['user'].can_view(user):
             return settings.DEFAULT_PROFILE_PICTURE
 
         return user.profile_picture
@@ -67,11 +126,10 @@ class UserSerializer(serializers.ModelSerializer):
     def get_groups(self, user):
         if 'course' not in self.context or not self.context['course']:
             return None
-        try:
-            groups = Participation.objects.get(user=user, course=self.context['course']).groups
-            return GroupSerializer(groups, many=True, context=self.context).data
-        except Participation.DoesNotExist:
+        participation = self._get_participation(user)
+        if participation is None:
             return None
+        return GroupSerializer(participation.groups.all(), many=True, context=self.context).data
 
 
 class OwnUserSerializer(serializers.ModelSerializer):
@@ -95,24 +153,7 @@ class OwnUserSerializer(serializers.ModelSerializer):
             assignment{id}: permissions
             general: permissions
         }"""
-        perms = {}
-        courses = user.participations.all()
-
-        perms['general'] = permissions.serialize_general_permissions(user)
-
-        for course in courses:
-            perms['course' + str(course.id)] = permissions.serialize_course_permissions(user, course)
-
-        assignments = set()
-        for course in courses:
-            for assignment in course.assignment_set.all():
-                if user.has_permission('can_grade', assignment) or user.has_permission('can_have_journal', assignment):
-                    assignments.add(assignment)
-
-        for assignment in assignments:
-            perms['assignment' + str(assignment.id)] = permissions.serialize_assignment_permissions(user, assignment)
-
-        return perms
+        return permissions.serialize_user_permissions(user)
 
 
 class PreferencesSerializer(serializers.ModelSerializer):
@@ -136,7 +177,7 @@ class CourseSerializer(serializers.ModelSerializer):
         return course.has_lti_link()
 
 
-class GroupSerializer(serializers.ModelSerializer):
+class GroupSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Group
         fields = '__all__'
@@ -265,12 +306,8 @@ class AssignmentSerializer(serializers.ModelSerializer):
             }
 
     def _get_teacher_deadline(self, assignment):
-        return Journal.objects.filter(assignment=assignment) \
-            .filter(
-                Q(node__entry__grade__grade__isnull=True) | Q(node__entry__grade__published=False),
-                node__entry__isnull=False) \
-            .values('node__entry__last_edited') \
-            .aggregate(Min('node__entry__last_edited'))['node__entry__last_edited__min']
+        return GradingQueueItem.objects.filter(assignment=assignment, journal__in=Journal.objects.values('pk')) \
+            .aggregate(Min('submitted'))['submitted__min']
 
     def _get_student_deadline(self, journal, assignment):
         """Get student deadline.
@@ -344,9 +381,10 @@ class AssignmentSerializer(serializers.ModelSerializer):
                 journals = Journal.objects.filter(assignment=assignment)
             course = self.context['course']
             users = course.participation_set.filter(role__can_have_journal=True).values('user')
+            journals = JournalSerializer.setup_eager_loading(
+                journals.filter(Q(authors__user__in=users) | Q(authors__isnull=True)).distinct().order_by('pk'))
             return JournalSerializer(
-                journals.filter(Q(authors__user__in=users) | Q(authors__isnull=True)).distinct(), many=True,
-                context=self.context).data
+                journals, many=True, context=JournalSerializer.setup_bulk_context(journals, self.context)).data
         else:
             return None
 
@@ -354,36 +392,11 @@ class AssignmentSerializer(serializers.ModelSerializer):
         if 'user' not in self.context or not self.context['user']:
             return None
 
-        course = self.context.get('course', None)
-        if course is None:
-            course = self._get_course(assignment)
-        # Get the stats from only the course that its linked to, when no courses are supplied.
-        users = User.objects.filter(
-            participation__course=course, participation__role__can_have_journal=True
-        )
-
-        # Get grade compared to users in the group
-        participation = Participation.objects.filter(user=self.context['user'], course=course)
-        if participation.exists():
-            participation = participation.first()
-            if participation.groups and users.filter(participation__groups=participation.groups.first()).exists():
-                users = users.filter(participation__groups=participation.groups.first())
-
-        stats = {}
-        journal_set = Journal.objects.filter(assignment=assignment).filter(authors__user__in=users)
-
-        # Grader stats
-        if self.context['user'].has_permission('can_grade', assignment):
-            stats['needs_marking'] = journal_set \
-                .filter(Q(node__entry__grade__grade=None) | Q(node__entry__grade=None),
-                        node__entry__isnull=False).values('node').count()
-            stats['unpublished'] = journal_set \
-                .filter(node__entry__isnull=False, node__entry__grade__published=False,
-                        node__entry__grade__grade__isnull=False).values('node').count()
-        # Other stats
-        stats['average_points'] = sum([journal.get_grade() for journal in journal_set]) / (journal_set.count() or 1)
-
-        return stats
+        # Stats of many assignments can be computed at once and passed in the context
+        if 'stats' in self.context:
+            return self.context['stats'][assignment.pk]
+
+        return statistics.get_assignments_stats([assignment], self.context['user'], self._get_course)[assignment.pk]
 
     def get_course(self, assignment):
         return CourseSerializer(self._get_course(assignment)).data
@@ -434,7 +447,7 @@ class NodeSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', )
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     author = serializers.SerializerMethodField()
     last_edited_by = serializers.SerializerMethodField()
     can_edit = serializers.SerializerMethodField()
@@ -466,7 +479,7 @@ class RoleSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'course')
 
 
-class JournalSerializer(serializers.ModelSerializer):
+class JournalSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     stats = serializers.SerializerMethodField()
     authors = serializers.SerializerMethodField()
     name = serializers.SerializerMethodField()
@@ -480,8 +493,28 @@ class JournalSerializer(serializers.ModelSerializer):
                   'locked')
         read_only_fields = ('id', 'assignment', 'authors', 'grade')
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Prefetch the authors of the journals with their users and assignment.
+
+        This allows serializing many journals with a constant number of queries, instead of several per journal.
+        """
+        return queryset.select_related('assignment').prefetch_related(
+            Prefetch('authors', queryset=AssignmentParticipation.objects.select_related('user', 'assignment')
+                     .order_by('pk')))
+
+    @staticmethod
+    def setup_bulk_context(journals, context):
+        """Add the participations of the authors of the journals and their visibility to the viewer to the context.
+
+        The journals should be eager loaded, see setup_eager_loading. Serializing the authors with the returned context
+        takes a fixed number of queries, see UserSerializer.setup_bulk_context.
+        """
+        return UserSerializer.setup_bulk_context(
+            [author.user for journal in journals for author in journal.authors.all()], context)
+
     def get_grade(self, journal):
-        return journal.get_grade()
+        return journal.get_grade(use_summary=True)
 
     def get_needs_lti_link(self, journal):
         return journal.needs_lti_link()
@@ -499,10 +532,10 @@ class JournalSerializer(serializers.ModelSerializer):
         if 'user' not in self.context or not self.context['user'].can_view(journal):
             return None
         return {
-            'acquired_points': journal.get_grade(),
-            'graded': journal.node_set.filter(entry__grade__grade__isnull=False).count(),
-            'published': journal.node_set.filter(entry__grade__published=True).count(),
-            'submitted': journal.node_set.filter(entry__isnull=False).count(),
+            'acquired_points': self.get_grade(journal),
+            'graded': journal.graded_count,
+            'published': journal.published_count,
+            'submitted': journal.submitted_count,
         }
 
 
@@ -516,7 +549,7 @@ class FormatSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', )
 
     def get_templates(self, format):
-        return TemplateSerializer(format.template_set.filter(archived=False).order_by('name'), many=True).data
+        return TemplateSerializer.cached_data_many(format.template_set.filter(archived=False).order_by('name'))
 
     def get_presets(self, format):
         return PresetNodeSerializer(format.presetnode_set.all().order_by('due_date'), many=True).data
@@ -554,7 +587,7 @@ class PresetNodeSerializer(serializers.ModelSerializer):
 
     def get_template(self, node):
         if node.type == Node.ENTRYDEADLINE:
-            return TemplateSerializer(node.forced_template).data
+            return TemplateSerializer.cached_data(node.forced_template)
         return None
 
 
@@ -580,10 +613,13 @@ class EntrySerializer(serializers.ModelSerializer):
         return None if entry.last_edited_by is None else entry.last_edited_by.full_name
 
     def get_template(self, entry):
-        return TemplateSerializer(entry.template).data
+        # Templates serialized beforehand can be passed in the context, keyed by pk
+        if 'templates' in self.context:
+            return self.context['templates'][entry.template_id]
+        return TemplateSerializer.cached_data(entry.template)
 
     def get_content(self, entry):
-        return ContentSerializer(entry.content_set.all(), many=True).data
+        return ContentSerializer(entry.content_set.all(), many=True, context=self.context).data
 
     def get_editable(self, entry):
         return entry.is_editable()
@@ -635,7 +671,25 @@ class TemplateSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', )
 
     def get_field_set(self, template):
-        return FieldSerializer(template.field_set.all().order_by('location'), many=True).data
+        # Sorted in Python, so prefetched fields can be used
+        return FieldSerializer(sorted(template.field_set.all(), key=lambda field: field.location), many=True).data
+
+    @staticmethod
+    def cached_data(template):
+        """Get the serialization of the template, reusing the one in the template cache when available."""
+        if template is None:
+            return TemplateSerializer(template).data
+        return TemplateSerializer.cached_data_many([template])[0]
+
+    @staticmethod
+    def cached_data_many(templates):
+        """Get the serialization of every template, reusing the ones in the template cache when available."""
+        def serialize_many(templates):
+            # The templates are loaded again with their fields, so fields prefetched before a change are not used
+            loaded = Template.objects.prefetch_related('field_set').in_bulk([template.pk for template in templates])
+            return [dict(TemplateSerializer(loaded[template.pk]).data) for template in templates]
+
+        return template_cache.get_many(templates, serialize_many)
 
 
 class ContentSerializer(serializers.ModelSerializer):
@@ -648,6 +702,10 @@ class ContentSerializer(serializers.ModelSerializer):
 
     def get_data(self, content):
         if content.field.type in Field.FILE_TYPES:
+            # The files can be loaded beforehand, keyed by the pk stored in the content
+            if 'files' in self.context:
+                file = self.context['files'].get(content.data)
+                return FileSerializer(file).data if file else None
             try:
                 return FileSerializer(FileContext.objects.get(pk=content.data)).data
             except FileContext.DoesNotExist:
@@ -50,6 +50,14 @@ LTI_KEY = os.environ['LTI_KEY']
 ROLES = OrderedDict({'Teacher': 'instructor', 'TA': 'teachingassistant', 'Student': 'learner'})
 LTI_ROLES = OrderedDict({'instructor': 'Teacher', 'teachingassistant': 'TA', 'learner': 'Student'})
 LTI_TEST_STUDENT_FULL_NAME = 'Test student'
+# Grade passback requests are sent by a pool of LTI_PASSBACK_WORKERS threads, with at most
+# LTI_PASSBACK_HOST_CONCURRENCY requests to the same LMS at once. Timeouts (in seconds) and server errors are retried
+# LTI_PASSBACK_RETRIES times, waiting LTI_PASSBACK_BACKOFF seconds before the first retry and doubling every next one.
+LTI_PASSBACK_WORKERS = 16
+LTI_PASSBACK_HOST_CONCURRENCY = 8
+LTI_PASSBACK_TIMEOUT = 10
+LTI_PASSBACK_RETRIES = 3
+LTI_PASSBACK_BACKOFF = 0.5
 
 
 # Celery settings
@@ -65,6 +73,35 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TASK_SERIALIZER = 'json'
 DJANGO_CELERY_BEAT_TZ_AWARE = False
+# Changed journals are collected in an outbox and their status is sent to the LMS once they have been waiting for
+# LMS_PASSBACK_WINDOW seconds, so a journal is sent at most once per window however often it changes. The outbox is
+# drained by the drain-passback-outbox periodic task, registered in the database by migration 0049.
+LMS_PASSBACK_WINDOW = 60
+LMS_PASSBACK_BATCH_SIZE = 500
+
+
+# Cache settings
+# Cached data is invalidated through the cache itself, so it is only shared between requests when every process uses
+# the same cache. With the default local memory backend, each process has its own cache and only the per request cache
+# is used. Configure a shared backend (e.g. memcached or redis) to share permissions, templates and ETags between
+# requests.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+SHARED_CACHE = CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+PERMISSION_CACHE_TIMEOUT = 60
+TEMPLATE_CACHE_TIMEOUT = 60 * 60 * 24
+# Names are cached per user, so renames can take this long to show up in the names of other requests
+NAMES_CACHE_TIMEOUT = 60
+
+# Largest page that can be requested from a paginated list
+MAX_PAGE_SIZE = 500
+DEFAULT_PAGE_SIZE = 50
+# Number of items serialized at once in streamed responses
+STREAM_CHUNK_SIZE = 200
 
 
 # Read for webserver, r + w for django
@@ -125,6 +162,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'VLE.utils.error_handling.ErrorMiddleware',
+    'VLE.utils.request_cache.RequestCacheMiddleware',
     'csp.middleware.CSPMiddleware',
 ]
 
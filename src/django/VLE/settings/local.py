@@ -37,6 +37,8 @@ ALLOWED_HOSTS = ['*']
 # If this is True, all tasks will be executed locally by blocking until the task returns.
 # TODO implement a testing environment, which does use background workers moving closer to production.
 CELERY_TASK_ALWAYS_EAGER = True if 'TRAVIS' in os.environ else False
+# Tests run in a single process, so the local memory cache is shared by all requests
+SHARED_CACHE = SHARED_CACHE or 'TRAVIS' in os.environ
 
 if 'TRAVIS' in os.environ:
     DATABASES = {
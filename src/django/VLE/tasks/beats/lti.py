@@ -1,12 +1,41 @@
 from __future__ import absolute_import, unicode_literals
 
+import datetime
+
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 
-from VLE.models import Journal
+from VLE.models import Journal, PassbackOutbox
 from VLE.utils import grading
 
 
 @shared_task
 def check_if_need_VLE_publish():
-    for journal in Journal.objects.all():
-        grading.send_journal_status_to_LMS(journal)
+    """Send the status of the journals that are outdated in the LMS, in chunks handled by parallel workers."""
+    journal_pks = list(Journal.objects.needs_lms_passback().values_list('pk', flat=True))
+    for i in range(0, len(journal_pks), settings.LMS_PASSBACK_BATCH_SIZE):
+        grading.task_journals_status_to_LMS.delay(journal_pks[i:i + settings.LMS_PASSBACK_BATCH_SIZE])
+    return len(journal_pks)
+
+
+@shared_task
+def drain_passback_outbox():
+    """Send the status of the journals that have been waiting in the outbox for at least LMS_PASSBACK_WINDOW seconds.
+
+    Rows locked by a concurrent drain are skipped, so every journal is sent by a single worker.
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.LMS_PASSBACK_WINDOW)
+    with transaction.atomic():
+        journal_pks = list(PassbackOutbox.objects.filter(dirty_since__lte=cutoff).order_by('dirty_since')
+                           .select_for_update(skip_locked=True)
+                           .values_list('journal', flat=True)[:settings.LMS_PASSBACK_BATCH_SIZE])
+        PassbackOutbox.objects.filter(journal__in=journal_pks).delete()
+
+    try:
+        return grading.task_journals_status_to_LMS(journal_pks)
+    except Exception:
+        # Changes made since the rows were removed are waiting already, the rest is sent with the next drain
+        PassbackOutbox.objects.mark_dirty(journal_pks)
+        raise
@@ -10,6 +10,7 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 
 from VLE.models import Entry, Journal, Node, PresetNode
+from VLE.utils import request_cache
 
 
 def _send_deadline_mail(deadline, journal):
@@ -88,10 +89,12 @@ def send_upcoming_deadlines():
         due_date__range=(
             datetime.datetime.utcnow().date() + datetime.timedelta(days=1),
             datetime.datetime.utcnow().date() + datetime.timedelta(days=2)))
-    _send_deadline_mails(upcoming_day_deadlines)
     upcoming_week_deadlines = PresetNode.objects.filter(
         due_date__range=(
             datetime.datetime.utcnow().date() + datetime.timedelta(days=7),
             datetime.datetime.utcnow().date() + datetime.timedelta(days=8)))
-    emails_sent_to = _send_deadline_mails(upcoming_week_deadlines)
+    # The active courses of the users are reused between their deadlines
+    with request_cache.scope():
+        _send_deadline_mails(upcoming_day_deadlines)
+        emails_sent_to = _send_deadline_mails(upcoming_week_deadlines)
     return emails_sent_to
@@ -3,13 +3,44 @@ timeline.py.
 
 Useful timeline functions.
 """
+from django.db.models import Prefetch
 from django.utils import timezone
 
-from VLE.models import Node
+from VLE.models import Content, Field, FileContext, Node
 from VLE.serializers import EntrySerializer, TemplateSerializer
 from VLE.utils import generic_utils as utils
 
 
+def get_timeline_nodes(journal):
+    """Get the sorted nodes of a journal with everything needed to serialize them.
+
+    The entries, grades, templates, contents and files are loaded in a fixed number of queries, regardless of the
+    number of nodes. Returns the nodes, a dict of the files referred to by their contents, keyed by the pk as stored
+    in the content, and a dict of the serialized templates of the nodes, keyed by pk. The templates come from the
+    template cache, those that are not cached are serialized at once.
+    """
+    nodes = list(utils.get_sorted_nodes(journal).select_related(
+        'entry', 'entry__grade', 'entry__author', 'entry__last_edited_by', 'entry__template',
+        'preset', 'preset__forced_template',
+    ).prefetch_related(
+        Prefetch('entry__content_set', queryset=Content.objects.select_related('field')),
+    ))
+
+    file_ids = set()
+    for node in nodes:
+        node.journal = journal
+        if node.entry:
+            file_ids.update(content.data for content in node.entry.content_set.all()
+                            if content.field.type in Field.FILE_TYPES and content.data and content.data.isdigit())
+    files = {str(file.pk): file for file in FileContext.objects.filter(pk__in=file_ids)} if file_ids else {}
+
+    templates = {template.pk: template for node in nodes for template in [
+        node.entry.template if node.entry else None, node.preset.forced_template if node.preset else None] if template}
+    templates = dict(zip(templates, TemplateSerializer.cached_data_many(list(templates.values()))))
+
+    return nodes, files, templates
+
+
 def get_nodes(journal, author=None):
     """Convert a journal to a list of node dictionaries.
 
@@ -17,11 +48,23 @@ def get_nodes(journal, author=None):
     add-node if the user can add to the journal, the subsequent
     progress node is in the future and maximally one.
     """
+    return get_nodes_with_index(journal, author)[0]
+
+
+def get_nodes_with_index(journal, author=None, target=None):
+    """Convert a journal to a list of node dictionaries, like get_nodes, while finding the index of a node.
+
+    Returns the list of node dictionaries and the index of the target node in that list, which is None when the
+    target is not part of the timeline.
+    """
+    index = None
     can_add = author and author not in journal.authors.all() and \
         author.has_permission('can_have_journal', journal.assignment) and not journal.needs_lti_link()
 
+    nodes, files, templates = get_timeline_nodes(journal)
+
     node_list = []
-    for node in utils.get_sorted_nodes(journal):
+    for node in nodes:
         # If there is a progress node upcoming, and there are stackable entries before the deadline
         # add an ADDNODE
         if node.type == Node.PROGRESS:
@@ -32,10 +75,12 @@ def get_nodes(journal, author=None):
                     node_list.append(add_node)
                 can_add = False
 
+        if target is not None and node.pk == target.pk:
+            index = len(node_list)
         if node.type == Node.ENTRY:
-            node_list.append(get_entry_node(node, author))
+            node_list.append(get_entry_node(node, author, files, templates))
         elif node.type == Node.ENTRYDEADLINE:
-            node_list.append(get_deadline(node, author))
+            node_list.append(get_deadline(node, author, files, templates))
         elif node.type == Node.PROGRESS:
             node_list.append(get_progress(node))
 
@@ -44,34 +89,52 @@ def get_nodes(journal, author=None):
         if add_node:
             node_list.append(add_node)
 
-    return node_list
+    return node_list, index
 
 
 # TODO: Make serializers for these functions as well (if possible)
 def get_add_node(journal):
     """Convert a add_node to a dictionary."""
-    if not journal or journal.assignment.format.template_set.filter(archived=False, preset_only=False).count() == 0:
+    if not journal:
+        return None
+    templates = list(journal.assignment.format.template_set.filter(archived=False, preset_only=False).order_by('name'))
+    if not templates:
         return None
     return {
         'type': Node.ADDNODE,
         'nID': -1,
-        'templates': TemplateSerializer(
-            journal.assignment.format.template_set.filter(archived=False, preset_only=False).order_by('name'),
-            many=True).data
+        'templates': TemplateSerializer.cached_data_many(templates)
     }
 
 
-def get_entry_node(node, user):
+def get_entry_node(node, user, files=None, templates=None):
     return {
         'type': node.type,
         'nID': node.id,
         'jID': node.journal.id,
-        'entry': EntrySerializer(node.entry, context={'user': user}).data if node.entry else None,
+        'entry': _serialize_entry(node.entry, user, files, templates),
     } if node else None
 
 
-def get_deadline(node, user):
+def _serialize_entry(entry, user, files, templates):
+    if not entry:
+        return None
+    context = {'user': user}
+    if files is not None:
+        context['files'] = files
+    if templates is not None:
+        context['templates'] = templates
+    return EntrySerializer(entry, context=context).data
+
+
+def get_deadline(node, user, files=None, templates=None):
     """Convert entrydeadline to a dictionary."""
+    if not node:
+        return None
+    if templates is not None and node.preset.forced_template_id in templates:
+        template = templates[node.preset.forced_template_id]
+    else:
+        template = TemplateSerializer.cached_data(node.preset.forced_template)
     return {
         'description': node.preset.description,
         'type': node.type,
@@ -80,9 +143,9 @@ def get_deadline(node, user):
         'unlock_date': node.preset.unlock_date,
         'due_date': node.preset.due_date,
         'lock_date': node.preset.lock_date,
-        'template': TemplateSerializer(node.preset.forced_template).data,
-        'entry': EntrySerializer(node.entry, context={'user': user}).data if node.entry else None,
-    } if node else None
+        'template': template,
+        'entry': _serialize_entry(node.entry, user, files, templates),
+    }
 
 
 def get_progress(node):
@@ -48,5 +48,6 @@ urlpatterns = [
     path('get_lti_params_from_jwt/', lti.get_lti_params_from_jwt, name='get_lti_params_from_jwt'),
     path('update_lti_groups/', lti.update_lti_groups, name='update_lti_groups'),
 
+    path('names/', common.batch_names, name='batch_names'),
     path('names/<int:course_id>/<int:assignment_id>/<int:journal_id>/', common.names, name='names'),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
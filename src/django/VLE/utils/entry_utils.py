@@ -3,7 +3,6 @@ Entry utilities.
 
 A library with utilities related to entries.
 """
-import VLE.timeline as timeline
 import VLE.validators as validators
 from VLE import factory
 from VLE.models import Field, Node
@@ -19,12 +18,6 @@ def patch_entry_content(user, entry, old_content, field, data, assignment):
     old_content.save()
 
 
-def get_node_index(journal, node, user):
-    for i, result_node in enumerate(timeline.get_nodes(journal, user)):
-        if result_node['nID'] == node.id:
-            return i
-
-
 def check_fields(template, content_list):
     """Check if the supplied content list is a valid for the given template"""
     received_ids = []
@@ -0,0 +1,103 @@
+"""
+etags.py.
+
+Change watermarks for conditional requests.
+
+Every journal and format has a version token in the cache, which is replaced whenever something shown by the
+journal or format endpoints changes. The ETag of a response combines these tokens with everything else the response
+depends on: the requesting user, their permissions and the dates of the assignment that have passed. When the ETag
+sent by the client is still current, the response is not built at all and 304 Not Modified is returned.
+
+The tokens are replaced through the cache itself, so ETags are only used when the cache is shared between processes
+(settings.SHARED_CACHE). Otherwise a change in one process would never reach the others.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.http import HttpResponseNotModified
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+
+import VLE.models
+import VLE.permissions as permissions
+
+
+def _key(kind, pk):
+    return 'etag:{}:{}'.format(kind, pk)
+
+
+def _version(kind, pk):
+    return cache.get_or_set(_key(kind, pk), lambda: uuid.uuid4().hex, None)
+
+
+def _bump(kind, pks):
+    if not settings.SHARED_CACHE:
+        return
+    cache.set_many({_key(kind, pk): uuid.uuid4().hex for pk in set(pks) if pk is not None}, None)
+
+
+def bump_journals(pks):
+    """Mark the journals with the given pks as changed."""
+    _bump('journal', pks)
+
+
+def bump_formats(pks):
+    """Mark the formats with the given pks as changed."""
+    _bump('format', pks)
+
+
+def _passed_dates(assignment):
+    """Count the dates of the assignment and its deadlines that have passed, as passing one changes the timeline."""
+    now = timezone.now()
+    passed = VLE.models.PresetNode.objects.filter(format=assignment.format_id).aggregate(
+        unlocked=Count('pk', filter=Q(unlock_date__lte=now)),
+        due=Count('pk', filter=Q(due_date__lte=now)),
+        locked=Count('pk', filter=Q(lock_date__lte=now)),
+    )
+    dates = [assignment.unlock_date, assignment.due_date, assignment.lock_date]
+    return sum(passed.values()) + sum(1 for date in dates if date is not None and date <= now)
+
+
+def _etag(resource, user, assignment, *versions):
+    parts = [resource, user.pk, permissions.cache_version(user), _passed_dates(assignment), *versions]
+    return quote_etag(hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest())
+
+
+def journal_etag(resource, journal, user):
+    """Get the ETag of a response of the journal for the user, the resource distinguishes different responses.
+
+    Returns None when ETags are not used.
+    """
+    if not settings.SHARED_CACHE:
+        return None
+    assignment = journal.assignment
+    return _etag(resource, user, assignment, _version('journal', journal.pk), _version('format', assignment.format_id))
+
+
+def format_etag(resource, assignment, user):
+    """Get the ETag of a response of the format of the assignment for the user, None when ETags are not used."""
+    if not settings.SHARED_CACHE:
+        return None
+    return _etag(resource, user, assignment, _version('format', assignment.format_id))
+
+
+def not_modified(request, etag):
+    """Get a 304 Not Modified response if the client already has the version with the ETag, None otherwise.
+
+    This should only be called after checking the user can view the resource.
+    """
+    if etag is not None and etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        return set_etag(HttpResponseNotModified(), etag)
+    return None
+
+
+def set_etag(response, etag):
+    """Set the ETag of the response, letting the client revalidate it before every reuse."""
+    if etag is None:
+        return response
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
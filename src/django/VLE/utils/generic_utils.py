@@ -12,6 +12,7 @@ from django.db.models import Case, When
 
 import VLE.factory as factory
 from VLE.models import Entry, Journal, Node, PresetNode, Template
+from VLE.utils import etags, template_cache
 from VLE.utils.error_handling import VLEBadRequest, VLEMissingRequiredKey, VLEParamWrongType
 
 
@@ -298,6 +299,9 @@ def archive_templates(templates):
         ids.append(template['id'])
 
     Template.objects.filter(pk__in=ids).update(archived=True)
+    # Updating a queryset does not send any signals
+    template_cache.invalidate()
+    etags.bump_formats(Template.objects.filter(pk__in=ids).values_list('format', flat=True))
 
 
 def base64ToContentFile(string, filename):
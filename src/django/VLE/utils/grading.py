@@ -1,11 +1,43 @@
 
 from celery import shared_task
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
-from VLE import factory
 from VLE.lti_grade_passback import GradePassBackRequest
-from VLE.models import AssignmentParticipation, Comment, Entry, Journal
+from VLE.models import AssignmentParticipation, Comment, Entry, Grade, GradingQueueItem, Journal, Node, PassbackOutbox
+from VLE.utils import etags, request_cache
+
+
+def publish_grades(entries, publisher):
+    """Publish the unpublished grades of the entries, in a single transaction with a fixed number of queries.
+
+    - entries: queryset of the entries in question
+    - publisher: the publisher of the grades
+
+    A published copy of the current grade of each entry is added to its grade history, as factory.make_grade would.
+    Returns the pks of the journals of which grades were published.
+    """
+    with transaction.atomic():
+        graded = entries.exclude(grade=None)
+        unpublished = list(
+            graded.filter(grade__published=False).select_related('grade').select_for_update(of=('self',)))
+        grades = Grade.objects.bulk_create([
+            Grade(entry=entry, author=publisher, grade=entry.grade.grade, published=True) for entry in unpublished
+        ])
+        for entry, grade in zip(unpublished, grades):
+            entry.grade = grade
+        Entry.objects.bulk_update(unpublished, ['grade'])
+        Comment.objects.filter(entry__in=graded.values('pk')).update(published=True)
+
+        # Bulk writes do not send the signals that keep the stored summaries and the grading queue up to date
+        entry_pks = [entry.pk for entry in unpublished]
+        journal_pks = list(Node.objects.filter(entry__in=entry_pks).values_list('journal', flat=True).distinct())
+        Journal.all_objects.filter(pk__in=journal_pks).update_summaries()
+        GradingQueueItem.objects.refresh(entry_pks)
+        etags.bump_journals(journal_pks)
+
+    return journal_pks
 
 
 def publish_all_journal_grades(journal, publisher):
@@ -14,12 +46,25 @@ def publish_all_journal_grades(journal, publisher):
     - journal: the journal in question
     - publisher: the publisher of the grade
     """
-    entries = Entry.objects.filter(node__journal=journal).exclude(grade=None)
+    return publish_grades(Entry.objects.filter(node__journal=journal), publisher)
+
+
+def publish_all_assignment_grades(assignment, publisher):
+    """publish all grades that are not None for the journals of an assignment.
+
+    - assignment: the assignment in question
+    - publisher: the publisher of the grades
+    """
+    return publish_grades(
+        Entry.objects.filter(node__journal__in=Journal.objects.filter(assignment=assignment).values('pk')), publisher)
 
-    for entry in entries:
-        factory.make_grade(entry, publisher.pk, entry.grade.grade, True)
 
-    Comment.objects.filter(entry__node__journal=journal).exclude(entry__grade=None).update(published=True)
+def queue_journal_status_to_LMS(journal_pks):
+    """Send the status of the journals to the LMS once they have been waiting for LMS_PASSBACK_WINDOW seconds.
+
+    Changes to the same journal within the window are coalesced into a single send.
+    """
+    PassbackOutbox.objects.mark_dirty(journal_pks)
 
 
 @shared_task
@@ -27,6 +72,13 @@ def task_journal_status_to_LMS(journal_pk):
     return send_journal_status_to_LMS(Journal.objects.get(pk=journal_pk))
 
 
+@shared_task
+def task_journals_status_to_LMS(journal_pks):
+    """Send the status of many journals in a single task, reusing the lookups shared between them."""
+    with request_cache.scope():
+        return send_journals_status_to_LMS(Journal.objects.filter(pk__in=journal_pks).prefetch_related('authors__user'))
+
+
 def send_journal_status_to_LMS(journal):
     """Replace a grade on the LTI instance based on the request.
 
@@ -35,29 +87,47 @@ def send_journal_status_to_LMS(journal):
 
     returns the lti reponse.
     """
-    if not journal.authors.exists():
-        return None
+    return send_journals_status_to_LMS([journal])[journal.pk]
 
-    Entry.objects.filter(node__in=journal.published_nodes).exclude(vle_coupling=Entry.LINK_COMPLETE)\
-        .update(vle_coupling=Entry.NEEDS_GRADE_PASSBACK)
 
-    response = {}
-    failed = False
-    for author in journal.authors.all():
-        response[author.id] = send_author_status_to_LMS(journal, author)
-        if not response[author.id]['successful']:
-            failed = True
+def send_journals_status_to_LMS(journals):
+    """Replace the grades of the journals on the LTI instance, sending the requests of all journals concurrently.
 
-    if not failed:
-        Entry.objects.filter(node__in=journal.published_nodes).update(vle_coupling=Entry.LINK_COMPLETE)
-        Entry.objects.filter(node__in=journal.unpublished_nodes).update(vle_coupling=Entry.SENT_SUBMISSION)
-        journal.LMS_grade = journal.get_grade()
-        journal.save()
-
-    return {
-        'successful': not failed,
-        **response,
-    }
+    returns a dict mapping the pk of every journal to its lti response, as send_journal_status_to_LMS.
+    """
+    statuses = []
+    for journal in journals:
+        authors = list(journal.authors.all())
+        if authors:
+            Entry.objects.filter(node__in=journal.published_nodes).exclude(vle_coupling=Entry.LINK_COMPLETE)\
+                .update(vle_coupling=Entry.NEEDS_GRADE_PASSBACK)
+        statuses.append((journal, [(author, *_author_status_requests(journal, author)) for author in authors]))
+
+    responses = iter(GradePassBackRequest.send_post_requests(
+        [request for _, authors in statuses for _, _, requests in authors for request in requests]))
+
+    results = {}
+    for journal, authors in statuses:
+        if not authors:
+            results[journal.pk] = None
+            continue
+
+        response = {}
+        for author, error, requests in authors:
+            response[author.id] = error or _author_status_response(*[next(responses) for _ in requests])
+        failed = not all(author_response['successful'] for author_response in response.values())
+
+        if not failed:
+            Entry.objects.filter(node__in=journal.published_nodes).update(vle_coupling=Entry.LINK_COMPLETE)
+            Entry.objects.filter(node__in=journal.unpublished_nodes).update(vle_coupling=Entry.SENT_SUBMISSION)
+            journal.LMS_grade = journal.get_grade()
+            journal.save()
+
+        results[journal.pk] = {
+            'successful': not failed,
+            **response,
+        }
+    return results
 
 
 @shared_task
@@ -68,25 +138,37 @@ def task_author_status_to_LMS(journal_pk, author_pk, left_journal=False):
 
 def send_author_status_to_LMS(journal, author, left_journal=False):
     """Send the status of about the author of the journal to both the teacher and the author"""
+    error, requests = _author_status_requests(journal, author, left_journal)
+    if error:
+        return error
+    return _author_status_response(*GradePassBackRequest.send_post_requests(requests))
+
+
+def _author_status_requests(journal, author, left_journal=False):
+    """Create the requests with the status of the author of the journal for the author and the teacher.
+
+    returns an error response and no requests when the status cannot be sent, else no error and the requests to the
+    student and the teacher, either of which is None when there is nothing to send.
+    """
     if author not in journal.authors.all() and not left_journal:
         return {
             'description': '{} not in journal {}'.format(author.user.full_name, journal.to_string()),
             'code_mayor': 'error',
             'successful': False,
-        }
+        }, ()
 
     if author.sourcedid is None:
         return {
             'description': '{} has no sourcedid'.format(author.to_string(user=author.user)),
             'code_mayor': 'error',
             'successful': False,
-        }
+        }, ()
     if author.grade_url is None:
         return {
             'description': '{} has no grade_url'.format(author.to_string(user=author.user)),
             'code_mayor': 'error',
             'successful': False,
-        }
+        }, ()
 
     course = journal.assignment.get_active_course(author.user)
     if not left_journal:
@@ -105,18 +187,17 @@ def send_author_status_to_LMS(journal, author, left_journal=False):
     submitted_at = None
 
     # Send student latest grade. But only send it when there are new entries OR grade changed
-    response_student = None
+    request_student = None
     if journal.published_nodes.filter(entry__vle_coupling=Entry.NEEDS_GRADE_PASSBACK).exists() or \
        journal.LMS_grade != grade:
         if journal.LMS_grade != grade:
             submitted_at = str(timezone.now())
         else:
             submitted_at = str(journal.published_nodes.last().entry.last_edited)
-        grade_request = GradePassBackRequest(
+        request_student = GradePassBackRequest(
             author, grade, result_data=result_data, send_score=True, submitted_at=submitted_at)
-        response_student = grade_request.send_post_request()
 
-    response_teacher = None
+    request_teacher = None
     if not left_journal:
         # Notify teacher about last ungraded submission
         if journal.unpublished_nodes.exists():
@@ -126,10 +207,13 @@ def send_author_status_to_LMS(journal, author, left_journal=False):
                     journal.unpublished_nodes.first().pk)
             }
             submitted_at = str(journal.unpublished_nodes.first().entry.last_edited)
-            grade_request = GradePassBackRequest(
+            request_teacher = GradePassBackRequest(
                 author, grade, result_data=result_data, send_score=False, submitted_at=submitted_at)
-            response_teacher = grade_request.send_post_request()
 
+    return None, (request_student, request_teacher)
+
+
+def _author_status_response(response_student, response_teacher):
     return {
         'to_teacher': response_teacher,
         'to_student': response_student,
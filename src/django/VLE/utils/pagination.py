@@ -0,0 +1,59 @@
+"""
+pagination.py.
+
+Opt-in keyset pagination and sparse fieldsets for list requests.
+
+A list request can pass a limit to get a single page of at most that many items, ordered by id. The response then
+contains a next_cursor, which is passed as the cursor of the request for the next page, or None on the last page.
+Pages are selected with id > cursor, so they are stable under concurrent inserts and use the primary key index.
+
+A list request can pass fields, a comma separated list of field names, to only serialize those fields.
+"""
+from django.conf import settings
+
+from VLE.utils import generic_utils as utils
+from VLE.utils.error_handling import VLEBadRequest
+
+
+def paginate(request, queryset, default_limit=None):
+    """Get the requested page of the queryset.
+
+    Arguments:
+    request -- request data
+        limit -- the maximum number of items in the page, defaults to default_limit
+        cursor -- the next_cursor of the previous page, the first page is returned when not given
+    queryset -- queryset of the items to paginate
+    default_limit -- the limit when none is requested, all items are returned when this is None as well
+
+    Returns the items of the page and a dict with the next_cursor to include in the response, which is empty when
+    the request is not paginated.
+    """
+    limit, cursor = utils.optional_typed_params(request.query_params, (int, 'limit'), (int, 'cursor'))
+    if limit is None:
+        limit = default_limit
+    if limit is None:
+        return queryset, {}
+    if not 0 < limit <= settings.MAX_PAGE_SIZE:
+        raise VLEBadRequest('The limit should be between 1 and {}.'.format(settings.MAX_PAGE_SIZE))
+
+    queryset = queryset.order_by('pk')
+    if cursor is not None:
+        queryset = queryset.filter(pk__gt=cursor)
+
+    # An extra item is fetched to know whether there is a next page
+    items = list(queryset[:limit + 1])
+    next_cursor = items[limit - 1].pk if len(items) > limit else None
+    return items[:limit], {'next_cursor': next_cursor}
+
+
+def requested_fields(request):
+    """Get the names of the fields to serialize, or None when all fields are requested.
+
+    Arguments:
+    request -- request data
+        fields -- comma separated list of the names of the fields to serialize
+    """
+    fields, = utils.optional_params(request.query_params, 'fields')
+    if fields is None:
+        return None
+    return [field.strip() for field in fields.split(',') if field.strip()]
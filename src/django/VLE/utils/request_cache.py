@@ -0,0 +1,57 @@
+"""
+request_cache.py.
+
+Memoization that lives for the duration of a single request.
+
+Lookups that are repeated many times while handling one request (e.g. the permissions of the requesting user)
+can be stored here. Outside of a scope nothing is stored and every lookup is computed again.
+"""
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+def _store():
+    return getattr(_local, 'store', None)
+
+
+@contextmanager
+def scope():
+    """Open a cache scope, nested scopes share the store of the outermost scope."""
+    if _store() is not None:
+        yield
+        return
+
+    _local.store = {}
+    try:
+        yield
+    finally:
+        _local.store = None
+
+
+def get_or_set(key, compute):
+    """Get the value stored under key, storing the result of compute() first if it is not yet cached."""
+    store = _store()
+    if store is None:
+        return compute()
+
+    if key not in store:
+        store[key] = compute()
+    return store[key]
+
+
+def clear():
+    """Drop everything cached in the current scope, used when the underlying data changes."""
+    store = _store()
+    if store is not None:
+        store.clear()
+
+
+class RequestCacheMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with scope():
+            return self.get_response(request)
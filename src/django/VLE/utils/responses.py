@@ -5,13 +5,16 @@ This file contains functions to easily generate common HTTP error responses
 using JsonResponses. These functions should be used whenever the client needs
 to receive the appropriate error code.
 """
+import json
 from urllib import parse
 
 from django.conf import settings
-from django.http import FileResponse, HttpResponse, JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
 from sentry_sdk import capture_exception, capture_message
 
 import VLE.models
+from VLE.utils import request_cache
 
 
 def sentry_log(description='No description given', exception=None):
@@ -142,6 +145,88 @@ def json_response(payload={}, description='', status=None, reason=None, charset=
     return JsonResponse(data={**payload, 'description': description}, status=status, reason=reason, charset=charset)
 
 
+class StreamedList:
+    """A list in a streamed json response, of which the items are serialized a chunk at a time.
+
+    The chunks are selected by primary key (pk > last pk of the previous chunk), so prefetches of the queryset are
+    applied to every chunk and only a single chunk is in memory at once. The first chunk is loaded and serialized
+    right away, so the failures of the first chunk still occur before the response is returned.
+
+    Arguments:
+    queryset     -- the items of the list, the list is ordered by primary key.
+    serialize    -- function serializing a list of items, e.g. lambda items: Serializer(items, many=True).data
+    chunk_size   -- the number of items that are serialized at once.
+    """
+
+    def __init__(self, queryset, serialize, chunk_size=None):
+        self.queryset = queryset.order_by('pk')
+        self.serialize = serialize
+        self.chunk_size = chunk_size or settings.STREAM_CHUNK_SIZE
+        self.first_chunk, self._next_pk = self._load(self.queryset)
+
+    def _load(self, queryset):
+        """Serialize the next chunk, returning it with the pk after which the following chunk starts, if any."""
+        items = list(queryset[:self.chunk_size])
+        return self.serialize(items), items[-1].pk if len(items) == self.chunk_size else None
+
+    @property
+    def complete(self):
+        """Whether the first chunk contains all items of the list."""
+        return self._next_pk is None
+
+    def chunks(self):
+        yield self.first_chunk
+        next_pk = self._next_pk
+        while next_pk is not None:
+            chunk, next_pk = self._load(self.queryset.filter(pk__gt=next_pk))
+            if chunk:
+                yield chunk
+
+
+def _stream_json(payload, encoder):
+    # The content is generated after the request is handled, so open the request cache again
+    with request_cache.scope():
+        try:
+            yield '{'
+            for i, (key, value) in enumerate(payload.items()):
+                yield '{}{}: '.format(', ' if i else '', json.dumps(key))
+                if isinstance(value, StreamedList):
+                    yield '['
+                    for j, chunk in enumerate(value.chunks()):
+                        yield ('' if j == 0 else ', ') + ', '.join(encoder.encode(item) for item in chunk)
+                    yield ']'
+                else:
+                    yield encoder.encode(value)
+            yield '}'
+        except Exception as exception:
+            # The status was already sent, reraise so the server aborts the response instead of completing it
+            sentry_log(exception=exception)
+            raise
+
+
+def stream_json(payload={}, description='', status=200):
+    """Returns a json response, of which large lists (see StreamedList) are streamed a chunk at a time.
+
+    When every list fits in its first chunk, a normal JsonResponse is returned. Otherwise the json is generated while
+    it is sent through a StreamingHttpResponse, so the lists are never completely in memory. Anything that can fail,
+    e.g. permission checks, should be done before calling this function, as the status cannot be changed once
+    streaming started. When a later chunk fails, the exception is logged and the response is aborted, so the client
+    receives an incomplete body, which is not valid json.
+
+    Arguments:
+    payload      -- Data to send with the request, should be dict instance. Values can be StreamedLists, other values
+                    are serialized by DjangoJSONEncoder.
+    description  -- Additional information about the reason of the response, included in the data payload.
+    status       -- HTTP status code for the response.
+    """
+    streamed = [value for value in payload.values() if isinstance(value, StreamedList)]
+    if all(value.complete for value in streamed):
+        return json_response({key: value.first_chunk if isinstance(value, StreamedList) else value
+                              for key, value in payload.items()}, description=description, status=status)
+    return StreamingHttpResponse(_stream_json({**payload, 'description': description}, DjangoJSONEncoder()),
+                                 content_type='application/json', status=status)
+
+
 def key_error(*keys, exception=None):
     """Generate a bad request response with each given key formatted in the description."""
     if len(keys) == 1:
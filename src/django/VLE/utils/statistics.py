@@ -0,0 +1,71 @@
+"""
+statistics.py.
+
+Statistics computed for many assignments at once.
+"""
+from collections import defaultdict
+
+from django.db.models import Avg, F, Sum
+
+import VLE.permissions as permissions
+from VLE.models import Assignment, AssignmentParticipation, Group, Journal, JournalQuerySet, User
+
+
+def get_stats_users(user, course):
+    """Get the users whose journals count towards the statistics the user sees in the course.
+
+    These are the users that can have a journal in the course, limited to the group of the user when that group
+    contains any of them.
+    """
+    users = User.objects.filter(participation__course=course, participation__role__can_have_journal=True)
+
+    group = Group.objects.filter(participation__user=user, participation__course=course).order_by('pk').first()
+    if group is not None and users.filter(participation__groups=group).exists():
+        users = users.filter(participation__groups=group)
+
+    return users
+
+
+def get_assignments_stats(assignments, user, get_course):
+    """Compute the statistics of many assignments from the journal summaries, with a grouped query per course.
+
+    Arguments:
+    assignments -- the assignments to compute the statistics for.
+    user -- the user requesting the statistics, which determines the students and the grader stats.
+    get_course -- function returning the course whose students are used for the statistics of an assignment.
+
+    Returns a dict mapping the pk of each assignment to its stats: average_points, and needs_marking and unpublished
+    when the user can grade the assignment.
+    """
+    assignments_per_course = defaultdict(list)
+    for assignment in assignments:
+        assignments_per_course[get_course(assignment)].append(assignment)
+
+    if user.is_superuser:
+        gradeable = {assignment.pk for assignment in assignments}
+    else:
+        gradeable = set(Assignment.objects.filter(
+            pk__in=[assignment.pk for assignment in assignments],
+            courses__in=permissions.courses_with_permission(user, 'can_grade')).values_list('pk', flat=True))
+
+    stats = {}
+    for course, course_assignments in assignments_per_course.items():
+        authors = AssignmentParticipation.objects.filter(user__in=get_stats_users(user, course))
+        summaries = {summary['assignment']: summary for summary in Journal.objects.filter(
+            assignment__in=course_assignments, pk__in=authors.values('journal'),
+        ).order_by().values('assignment').annotate(
+            average_points=Avg(JournalQuerySet.grade_expression()),
+            needs_marking=Sum(F('submitted_count') - F('graded_count')),
+            unpublished=Sum('unpublished_count'),
+        )}
+
+        for assignment in course_assignments:
+            summary = summaries.get(assignment.pk, {})
+            assignment_stats = {}
+            if assignment.pk in gradeable:
+                assignment_stats['needs_marking'] = summary.get('needs_marking', 0)
+                assignment_stats['unpublished'] = summary.get('unpublished', 0)
+            assignment_stats['average_points'] = summary.get('average_points', 0)
+            stats[assignment.pk] = assignment_stats
+
+    return stats
@@ -0,0 +1,54 @@
+"""
+template_cache.py.
+
+Cache of serialized templates.
+
+Templates are archived and recreated instead of changed once they are in use, so their serialization rarely
+changes. The cached serializations are keyed by a version token, which is replaced whenever any template or field
+is written, so stale serializations are never read again and simply expire. As the token is replaced through the
+cache itself, serializations are only cached when the cache is shared between processes (settings.SHARED_CACHE).
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'template:version'
+
+
+def _version():
+    return cache.get_or_set(VERSION_KEY, lambda: uuid.uuid4().hex, None)
+
+
+def invalidate():
+    """Invalidate all cached templates, used whenever a template or one of its fields changes."""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _keys(templates):
+    version = _version()
+    return ['template:{}:{}'.format(version, template.pk) for template in templates]
+
+
+def get_many(templates, serialize_many):
+    """Get the serialization of every template, serializing and storing those that are not yet cached.
+
+    Arguments:
+    templates -- the templates to get the serialization of.
+    serialize_many -- function serializing a list of templates, returning a list of serializations.
+
+    Returns a list with the serialization of each template, in the order of templates.
+    """
+    if not settings.SHARED_CACHE:
+        return serialize_many(list(templates))
+
+    keys = _keys(templates)
+    cached = cache.get_many(keys)
+
+    missing = [(key, template) for key, template in zip(keys, templates) if key not in cached]
+    if missing:
+        serialized = dict(zip([key for key, _ in missing], serialize_many([template for _, template in missing])))
+        cache.set_many(serialized, settings.TEMPLATE_CACHE_TIMEOUT)
+        cached.update(serialized)
+
+    return [cached[key] for key in keys]
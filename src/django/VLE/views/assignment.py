@@ -18,7 +18,7 @@ import VLE.utils.responses as response
 import VLE.validators as validators
 from VLE.models import Assignment, Course, Field, Journal, PresetNode, Template, User
 from VLE.serializers import AssignmentDetailsSerializer, AssignmentSerializer, CourseSerializer
-from VLE.utils import file_handling, grading
+from VLE.utils import file_handling, grading, statistics
 from VLE.utils.error_handling import VLEMissingRequiredKey, VLEParamWrongType
 
 
@@ -73,13 +73,17 @@ class AssignmentView(viewsets.ViewSet):
             course = None
             courses = request.user.participations.all()
 
-        query = Assignment.objects.filter(courses__in=courses).distinct()
-        viewable = [assignment for assignment in query if request.user.can_view(assignment)]
-        serializer = AssignmentSerializer(viewable, many=True, context={'user': request.user, 'course': course})
+        viewable = Assignment.objects.filter(courses__in=courses).viewable_by(request.user).distinct()
+        active_courses = Assignment.get_active_courses(viewable, request.user) if course is None else {}
+        stats = statistics.get_assignments_stats(
+            viewable, request.user, lambda assignment: course or active_courses[assignment.pk])
+        serializer = AssignmentSerializer(
+            viewable, many=True, context={'user': request.user, 'course': course, 'stats': stats})
 
+        lti_couples = {assignment.pk: len(assignment.lti_id_set) for assignment in viewable}
         data = serializer.data
         for i, assignment in enumerate(data):
-            data[i]['lti_couples'] = len(Assignment.objects.get(id=assignment['id']).lti_id_set)
+            data[i]['lti_couples'] = lti_couples[assignment['id']]
         return response.success({'assignments': data})
 
     def create(self, request):
@@ -317,11 +321,14 @@ class AssignmentView(viewsets.ViewSet):
             courses = request.user.participations.all()
 
         now = timezone.now()
-        query = Assignment.objects.filter(
+        viewable = Assignment.objects.filter(
             Q(lock_date__gt=now) | Q(lock_date=None), courses__in=courses
-        ).distinct()
-        viewable = [assignment for assignment in query if request.user.can_view(assignment)]
-        upcoming = AssignmentSerializer(viewable, context={'user': request.user, 'course': course}, many=True).data
+        ).viewable_by(request.user).distinct()
+        active_courses = Assignment.get_active_courses(viewable, request.user) if course is None else {}
+        stats = statistics.get_assignments_stats(
+            viewable, request.user, lambda assignment: course or active_courses[assignment.pk])
+        upcoming = AssignmentSerializer(
+            viewable, context={'user': request.user, 'course': course, 'stats': stats}, many=True).data
 
         return response.success({'upcoming': upcoming})
 
@@ -409,7 +416,7 @@ class AssignmentView(viewsets.ViewSet):
         for j, b in bonuses.items():
             j.bonus_points = b
             j.save()
-            grading.task_journal_status_to_LMS.delay(journal.pk)
+        grading.queue_journal_status_to_LMS([j.pk for j in bonuses])
 
         return response.success()
 
@@ -521,13 +528,8 @@ class AssignmentView(viewsets.ViewSet):
 
         request.user.check_permission('can_manage_journals', assignment)
 
-        participants_without_journal = []
-        for participant_without_journal in User.objects.filter(assignmentparticipation__assignment__pk=pk,
-                                                               assignmentparticipation__journal=None):
-            if participant_without_journal.has_permission('can_have_journal', assignment):
-                participants_without_journal.append({
-                    'full_name': participant_without_journal.full_name,
-                    'id': participant_without_journal.pk
-                })
+        participants_without_journal = list(User.objects.filter(
+            assignmentparticipation__assignment=assignment, assignmentparticipation__journal=None,
+        ).can_have_journal(assignment).order_by('pk').values('full_name', 'id'))
 
         return response.success({'participants': participants_without_journal})
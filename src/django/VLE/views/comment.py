@@ -10,7 +10,7 @@ import VLE.utils.generic_utils as utils
 import VLE.utils.responses as response
 from VLE.models import Comment, Entry
 from VLE.serializers import CommentSerializer
-from VLE.utils import file_handling
+from VLE.utils import file_handling, pagination
 
 
 class CommentView(viewsets.ViewSet):
@@ -30,6 +30,8 @@ class CommentView(viewsets.ViewSet):
         Arguments:
         request -- request data
             entry_id -- entry ID
+            limit, cursor -- optional keyset pagination, see VLE.utils.pagination
+            fields -- optional comma separated list of the comment fields to serialize
 
         Returns:
         On failure:
@@ -53,8 +55,10 @@ class CommentView(viewsets.ViewSet):
         else:
             comments = Comment.objects.filter(entry=entry, published=True)
 
-        serializer = CommentSerializer(comments, context={'user': request.user}, many=True)
-        return response.success({'comments': serializer.data})
+        comments, page = pagination.paginate(request, comments)
+        serializer = CommentSerializer(
+            comments, context={'user': request.user}, many=True, fields=pagination.requested_fields(request))
+        return response.success({'comments': serializer.data, **page})
 
     def create(self, request):
         """Create a new comment.
@@ -5,10 +5,66 @@ In this file are all the extra api requests.
 This includes:
     /names/ -- to get the names belonging to the ids
 """
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework.decorators import api_view
 
+import VLE.permissions as permissions
+import VLE.utils.generic_utils as utils
 import VLE.utils.responses as response
 from VLE.models import Assignment, Course, Journal
+from VLE.utils.error_handling import VLEBadRequest, VLEParamWrongType
+
+
+def _resolve_names(user, queryset, ids, get_name):
+    """Get the names of the objects with the given ids, checking the user can view each of them.
+
+    Names are cached per user and permission version, which also changes when the user joins or leaves a journal, so
+    only the objects that were not recently resolved for the user are loaded, with a single query. As the permission
+    version is replaced through the cache, names are only cached when the cache is shared between processes.
+    """
+    model = queryset.model._meta.model_name
+    version = permissions.cache_version(user)
+    keys = {pk: 'names:{}:{}:{}:{}'.format(user.pk, version, model, pk) for pk in set(ids)}
+    cached = cache.get_many(keys.values()) if settings.SHARED_CACHE else {}
+    names = {pk: cached[key] for pk, key in keys.items() if key in cached}
+
+    missing = [pk for pk in keys if pk not in names]
+    if missing:
+        objs = queryset.in_bulk(missing)
+        for pk in missing:
+            if pk not in objs:
+                raise queryset.model.DoesNotExist(
+                    '{} matching query does not exist.'.format(queryset.model._meta.object_name))
+            user.check_can_view(objs[pk])
+            names[pk] = get_name(objs[pk])
+        if settings.SHARED_CACHE:
+            cache.set_many({keys[pk]: names[pk] for pk in missing}, settings.NAMES_CACHE_TIMEOUT)
+
+    return names
+
+
+def _course_names(user, ids):
+    return _resolve_names(user, Course.objects.all(), ids, lambda course: course.name)
+
+
+def _assignment_names(user, ids):
+    return _resolve_names(user, Assignment.objects.all(), ids, lambda assignment: assignment.name)
+
+
+def _journal_names(user, ids):
+    journals = Journal.objects.select_related('assignment').prefetch_related('authors__user')
+    return _resolve_names(user, journals, ids, lambda journal: journal.get_name())
+
+
+def _id_list(params, key):
+    value, = utils.optional_params(params, key)
+    if value is None:
+        return []
+    try:
+        return [int(pk) for pk in value.split(',') if pk.strip()]
+    except ValueError as err:
+        raise VLEParamWrongType(err)
 
 
 @api_view(['GET'])
@@ -27,18 +83,44 @@ def names(request, course_id, assignment_id, journal_id):
     """
     result = {}
     if course_id:
-        course = Course.objects.get(pk=course_id)
-        request.user.check_can_view(course)
-        result['course'] = course.name
+        result['course'] = _course_names(request.user, [course_id])[course_id]
 
     if assignment_id:
-        assignment = Assignment.objects.get(pk=assignment_id)
-        request.user.check_can_view(assignment)
-        result['assignment'] = assignment.name
+        result['assignment'] = _assignment_names(request.user, [assignment_id])[assignment_id]
 
     if journal_id:
-        journal = Journal.objects.get(pk=journal_id)
-        request.user.check_can_view(journal)
-        result['journal'] = journal.get_name()
+        result['journal'] = _journal_names(request.user, [journal_id])[journal_id]
 
     return response.success({'names': result})
+
+
+@api_view(['GET'])
+def batch_names(request):
+    """Get the names of many courses, assignments and journals at once.
+
+    Arguments:
+    request -- the request that was sent
+        course_ids -- optional comma separated list of course ids
+        assignment_ids -- optional comma separated list of assignment ids
+        journal_ids -- optional comma separated list of journal ids
+
+    Returns:
+    On failure:
+        unauthorized -- when the user is not logged in
+        bad request -- when more than MAX_PAGE_SIZE ids are requested
+        not found -- when one of the objects does not exist
+        forbidden -- when the user is not allowed to view one of the objects
+    On success:
+        success -- with the names in 'courses', 'assignments' and 'journals', each mapping the ids to their names
+    """
+    course_ids = _id_list(request.query_params, 'course_ids')
+    assignment_ids = _id_list(request.query_params, 'assignment_ids')
+    journal_ids = _id_list(request.query_params, 'journal_ids')
+    if len(course_ids) + len(assignment_ids) + len(journal_ids) > settings.MAX_PAGE_SIZE:
+        raise VLEBadRequest('At most {} names can be requested at once.'.format(settings.MAX_PAGE_SIZE))
+
+    return response.success({'names': {
+        'courses': _course_names(request.user, course_ids),
+        'assignments': _assignment_names(request.user, assignment_ids),
+        'journals': _journal_names(request.user, journal_ids),
+    }})
@@ -108,14 +108,15 @@ class EntryView(viewsets.ViewSet):
                 request.user, file.access_id, content=content, in_rich_text=content.field.type == Field.RICH_TEXT)
 
         # Notify teacher on new entry
-        grading.task_journal_status_to_LMS.delay(journal.pk)
+        grading.queue_journal_status_to_LMS([journal.pk])
 
         # Delete old user files
         file_handling.remove_unused_user_files(request.user)
 
+        nodes, added = timeline.get_nodes_with_index(journal, request.user, node)
         return response.created({
-            'added': entry_utils.get_node_index(journal, node, request.user),
-            'nodes': timeline.get_nodes(journal, request.user),
+            'added': added,
+            'nodes': nodes,
             'entry': serialize.EntrySerializer(entry, context={'user': request.user}).data
         })
 
@@ -205,7 +206,7 @@ class EntryView(viewsets.ViewSet):
                 request.user, file.access_id, content=content, in_rich_text=content.field.type == Field.RICH_TEXT)
 
         file_handling.remove_unused_user_files(request.user)
-        grading.task_journal_status_to_LMS.delay(journal.pk)
+        grading.queue_journal_status_to_LMS([journal.pk])
         entry.last_edited_by = request.user
         entry.save()
 
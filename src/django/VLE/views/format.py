@@ -9,7 +9,7 @@ import VLE.utils.generic_utils as utils
 import VLE.utils.responses as response
 from VLE.models import Assignment, Field, Group, PresetNode
 from VLE.serializers import AssignmentDetailsSerializer, FormatSerializer
-from VLE.utils import file_handling
+from VLE.utils import etags, file_handling
 
 
 class FormatView(viewsets.ViewSet):
@@ -28,17 +28,24 @@ class FormatView(viewsets.ViewSet):
         pk -- the assignment id
 
         Returns a json string containing the format as well as the
-        corresponding assignment name and description.
+        corresponding assignment name and description, or not modified
+        when the If-None-Match header contains the current ETag of the format.
         """
         assignment = Assignment.objects.get(pk=pk)
 
         request.user.check_can_view(assignment)
         request.user.check_permission('can_edit_assignment', assignment)
 
+        etag = etags.format_etag('format', assignment, request.user)
+        not_modified = etags.not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
         serializer = FormatSerializer(assignment.format)
         assignment_details = AssignmentDetailsSerializer(assignment, context={'user': request.user})
 
-        return response.success({'format': serializer.data, 'assignment_details': assignment_details.data})
+        return etags.set_etag(
+            response.success({'format': serializer.data, 'assignment_details': assignment_details.data}), etag)
 
     def partial_update(self, request, pk):
         """Update an existing journal format.
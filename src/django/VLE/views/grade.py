@@ -3,6 +3,7 @@ grade.py.
 
 In this file are all the grade api requests.
 """
+from django.conf import settings
 from rest_framework import viewsets
 from rest_framework.decorators import action
 
@@ -10,8 +11,10 @@ import VLE.factory as factory
 import VLE.utils.generic_utils as utils
 import VLE.utils.grading as grading
 import VLE.utils.responses as response
-from VLE.models import Assignment, Comment, Entry, Grade, Journal
+from VLE.models import Assignment, Comment, Entry, Grade, GradingQueueItem, Group
 from VLE.serializers import EntrySerializer, GradeHistorySerializer
+from VLE.utils import etags
+from VLE.utils.error_handling import VLEBadRequest
 
 
 class GradeView(viewsets.ViewSet):
@@ -20,6 +23,7 @@ class GradeView(viewsets.ViewSet):
     This class creates the following api paths:
     GET /grades/ -- gets the grade history of an entry
     POST /grades/ -- grade an entry
+    GET /grades/queue/ -- gets the entries that need marking
     """
 
     def list(self, request):
@@ -85,7 +89,9 @@ class GradeView(viewsets.ViewSet):
 
         if published:
             Comment.objects.filter(entry=entry).update(published=True)
-            grading.task_journal_status_to_LMS.delay(journal.pk)
+            # The update sends no signals, so the journal is only changed for its ETag after the comments are published
+            etags.bump_journals([journal.pk])
+            grading.queue_journal_status_to_LMS([journal.pk])
 
         return response.created({
             'entry': EntrySerializer(entry, context={'user': request.user}).data,
@@ -99,8 +105,52 @@ class GradeView(viewsets.ViewSet):
 
         request.user.check_permission('can_publish_grades', assignment)
 
-        for journal in Journal.objects.filter(assignment=assignment).distinct():
-            grading.publish_all_journal_grades(journal, request.user)
-            grading.task_journal_status_to_LMS.delay(journal.pk)
+        grading.queue_journal_status_to_LMS(grading.publish_all_assignment_grades(assignment, request.user))
 
         return response.success()
+
+    @action(methods=['get'], detail=False)
+    def queue(self, request):
+        """Get the entries that need marking in the assignments the user can grade, the longest waiting first.
+
+        Arguments:
+        request -- request data
+            state -- optional state of the entries, either ungraded (default) or unpublished
+            assignment_id -- optional assignment ID to only get the entries of
+            group_id -- optional group ID to only get the entries of the journals of its members
+            limit -- optional maximum number of entries, defaults to DEFAULT_PAGE_SIZE
+
+        Returns:
+        On failure:
+            unauthorized -- when the user is not logged in
+            bad request -- when the state or limit is invalid
+            not found -- when the assignment or group does not exist
+            forbidden -- when the user cannot grade the assignment or view the course of the group
+        On success:
+            success -- with the entries, each with the ids of the entry, its node, journal and assignment, when it
+                was submitted and its state
+        """
+        state, = utils.optional_params(request.query_params, 'state')
+        assignment_id, group_id, limit = utils.optional_typed_params(
+            request.query_params, (int, 'assignment_id'), (int, 'group_id'), (int, 'limit'))
+        state = state or GradingQueueItem.UNGRADED
+        limit = settings.DEFAULT_PAGE_SIZE if limit is None else limit
+        if state not in dict(GradingQueueItem.STATES):
+            raise VLEBadRequest('Unknown state {}.'.format(state))
+        if not 0 < limit <= settings.MAX_PAGE_SIZE:
+            raise VLEBadRequest('The limit should be between 1 and {}.'.format(settings.MAX_PAGE_SIZE))
+
+        items = GradingQueueItem.objects.gradable_by(request.user).filter(state=state)
+        if assignment_id is not None:
+            assignment = Assignment.objects.get(pk=assignment_id)
+            request.user.check_permission('can_grade', assignment)
+            items = items.filter(assignment=assignment)
+        if group_id is not None:
+            group = Group.objects.get(pk=group_id)
+            request.user.check_can_view(group.course)
+            items = items.in_group(group)
+
+        fields = ['entry_id', 'node_id', 'journal_id', 'assignment_id', 'submitted', 'state']
+        entries = [dict(zip(fields, item)) for item in items.order_by('submitted', 'entry').values_list(
+            'entry', 'entry__node', 'journal', 'assignment', 'submitted', 'state')[:limit]]
+        return response.success({'entries': entries})
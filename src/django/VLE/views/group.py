@@ -12,6 +12,7 @@ import VLE.utils.generic_utils as utils
 import VLE.utils.responses as response
 from VLE.models import Assignment, Course, Group, Journal, Participation
 from VLE.serializers import GroupSerializer
+from VLE.utils import pagination
 from VLE.utils.error_handling import VLEPermissionError
 
 
@@ -30,6 +31,8 @@ class GroupView(viewsets.ViewSet):
         Arguments:
         request -- request data
             course_id -- course ID
+            limit, cursor -- optional keyset pagination, see VLE.utils.pagination
+            fields -- optional comma separated list of the group fields to serialize
 
         Returns:
         On failure:
@@ -64,9 +67,11 @@ class GroupView(viewsets.ViewSet):
             queryset = groups.distinct()
         else:
             queryset = Group.objects.filter(course=course)
-        serializer = GroupSerializer(queryset, many=True, context={'user': request.user, 'course': course})
+        groups, page = pagination.paginate(request, queryset)
+        serializer = GroupSerializer(groups, many=True, fields=pagination.requested_fields(request),
+                                     context={'user': request.user, 'course': course})
 
-        return response.success({'groups': serializer.data})
+        return response.success({'groups': serializer.data, **page})
 
     def create(self, request):
         """Create a new course group.
@@ -165,6 +170,8 @@ class GroupView(viewsets.ViewSet):
         factory.make_lti_groups(course)
 
         queryset = Group.objects.filter(course=course)
-        serializer = GroupSerializer(queryset, many=True, context={'user': request.user, 'course': course})
+        groups, page = pagination.paginate(request, queryset)
+        serializer = GroupSerializer(groups, many=True, fields=pagination.requested_fields(request),
+                                     context={'user': request.user, 'course': course})
 
-        return response.success({'groups': serializer.data})
+        return response.success({'groups': serializer.data, **page})
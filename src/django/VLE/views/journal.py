@@ -13,7 +13,7 @@ import VLE.utils.responses as response
 import VLE.validators as validators
 from VLE.models import Assignment, AssignmentParticipation, Course, FileContext, Journal, User
 from VLE.serializers import JournalSerializer
-from VLE.utils import file_handling
+from VLE.utils import etags, file_handling, pagination
 
 
 class JournalView(viewsets.ViewSet):
@@ -34,6 +34,8 @@ class JournalView(viewsets.ViewSet):
         request -- request data
             course_id -- course ID
             assignment_id -- assignment ID
+            limit, cursor -- optional keyset pagination, see VLE.utils.pagination
+            fields -- optional comma separated list of the journal fields to serialize
 
         Returns:
         On failure:
@@ -55,16 +57,19 @@ class JournalView(viewsets.ViewSet):
         request.user.check_can_view(course)
 
         users = course.participation_set.filter(role__can_have_journal=True).values('user')
-        journals = JournalSerializer(
+        journals, page = pagination.paginate(request, JournalSerializer.setup_eager_loading(
             Journal.objects.filter(assignment=assignment).filter(
-                Q(authors__user__in=users) | Q(authors__isnull=True)).distinct().order_by('pk'),
-            many=True,
-            context={
-                'user': request.user,
-                'course': course,
-            }).data
+                Q(authors__user__in=users) | Q(authors__isnull=True)).distinct().order_by('pk')))
+        fields = pagination.requested_fields(request)
 
-        return response.success({'journals': journals})
+        def serialize(journals):
+            context = JournalSerializer.setup_bulk_context(journals, {'user': request.user, 'course': course})
+            return JournalSerializer(journals, many=True, fields=fields, context=context).data
+
+        # Without a page, large lists of journals are streamed a chunk at a time
+        if not page:
+            return response.stream_json({'journals': response.StreamedList(journals, serialize)})
+        return response.success({'journals': serialize(journals), **page})
 
     def retrieve(self, request, pk):
         """Get a student submitted journal.
@@ -80,6 +85,7 @@ class JournalView(viewsets.ViewSet):
             forbidden -- when the user has no permission to view the journal
         On success:
             success -- with journals and stats about the journals
+            not modified -- when the If-None-Match header contains the current ETag of the journal
 
         """
         journal = Journal.all_objects.get(pk=pk)
@@ -93,11 +99,16 @@ class JournalView(viewsets.ViewSet):
 
         request.user.check_can_view(journal)
 
+        etag = etags.journal_etag('journal', journal, request.user)
+        not_modified = etags.not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
         serializer = JournalSerializer(journal, context={
             'user': request.user,
             'course': journal.assignment.get_active_course(request.user)
         })
-        return response.success({'journal': serializer.data})
+        return etags.set_etag(response.success({'journal': serializer.data}), etag)
 
     def create(self, request):
         """Create a batch of journals.
@@ -129,8 +140,9 @@ class JournalView(viewsets.ViewSet):
                 name=self._get_name(name, amount, assignment)
             ))
 
+        journals = JournalSerializer.setup_eager_loading(Journal.objects.filter(assignment=assignment).order_by('pk'))
         serializer = JournalSerializer(
-            Journal.objects.filter(assignment=assignment), many=True, context={'user': request.user})
+            journals, many=True, context=JournalSerializer.setup_bulk_context(journals, {'user': request.user}))
         return response.created({'journals': serializer.data})
 
     def _get_name(self, name, amount, assignment):
@@ -189,7 +201,7 @@ class JournalView(viewsets.ViewSet):
             req_data.pop('bonus_points', None)
             journal.bonus_points = bonus_points
             journal.save()
-            grading.task_journal_status_to_LMS.delay(journal.pk)
+            grading.queue_journal_status_to_LMS([journal.pk])
             return response.success({'journal': JournalSerializer(journal, context={'user': request.user}).data})
 
         name, author_limit, image = utils.optional_typed_params(request.data, (str, 'name'), (int, 'author_limit'),
@@ -278,6 +290,7 @@ class JournalView(viewsets.ViewSet):
 
         author = AssignmentParticipation.objects.get(assignment=journal.assignment, user=request.user)
         journal.authors.add(author)
+        etags.bump_journals([journal.pk])
         grading.task_author_status_to_LMS.delay(journal.pk, author.pk)
 
         serializer = JournalSerializer(journal, context={'user': request.user})
@@ -321,6 +334,8 @@ class JournalView(viewsets.ViewSet):
             author = AssignmentParticipation.objects.get(assignment=journal.assignment, user=user)
             journal.authors.add(author)
             grading.task_author_status_to_LMS.delay(journal.pk, author.pk)
+        # Adding authors updates the participations in bulk, which does not send the signals that mark the change
+        etags.bump_journals([journal.pk])
 
         serializer = JournalSerializer(journal, context={'user': request.user})
         return response.success({'journal': serializer.data})
@@ -342,6 +357,7 @@ class JournalView(viewsets.ViewSet):
 
         author = AssignmentParticipation.objects.get(user=request.user, journal=journal)
         journal.authors.remove(author)
+        etags.bump_journals([journal.pk])
         if journal.authors.count() == 0:
             journal.reset()
 
@@ -371,6 +387,7 @@ class JournalView(viewsets.ViewSet):
 
         author = AssignmentParticipation.objects.get(user=user, journal=journal)
         journal.authors.remove(author)
+        etags.bump_journals([journal.pk])
         if journal.authors.count() == 0:
             journal.reset()
 
@@ -411,7 +428,8 @@ class JournalView(viewsets.ViewSet):
 
     def publish(self, request, journal):
         grading.publish_all_journal_grades(journal, request.user)
-        grading.task_journal_status_to_LMS.delay(journal.pk)
+        grading.queue_journal_status_to_LMS([journal.pk])
+        journal.refresh_from_db()
         return response.success({
             'journal': JournalSerializer(journal, context={'user': request.user}).data
         })
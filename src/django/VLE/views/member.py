@@ -33,8 +33,9 @@ class MemberView(viewsets.ViewSet):
 
         member.groups.add(group)
         member.save()
-        users = UserSerializer(
-            group.course.users, context={'course': group.course, 'user': request.user}, many=True).data
+        users = group.course.users.all()
+        context = UserSerializer.setup_bulk_context(users, {'course': group.course, 'user': request.user})
+        users = UserSerializer(users, context=context, many=True).data
         return response.created({'participants': users})
 
     def destroy(self, request, pk):
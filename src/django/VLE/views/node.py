@@ -9,6 +9,7 @@ import VLE.timeline as timeline
 import VLE.utils.generic_utils as utils
 import VLE.utils.responses as response
 from VLE.models import Journal
+from VLE.utils import etags
 
 
 class NodeView(viewsets.ModelViewSet):
@@ -32,6 +33,7 @@ class NodeView(viewsets.ModelViewSet):
             forbidden -- when the user is not part of the course
         On success:
             success -- with the node data
+            not modified -- when the If-None-Match header contains the current ETag of the nodes
 
         """
         journal_id, = utils.required_typed_params(request.query_params, (int, 'journal_id'))
@@ -39,4 +41,9 @@ class NodeView(viewsets.ModelViewSet):
 
         request.user.check_can_view(journal)
 
-        return response.success({'nodes': timeline.get_nodes(journal, request.user)})
+        etag = etags.journal_etag('nodes', journal, request.user)
+        not_modified = etags.not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        return etags.set_etag(response.success({'nodes': timeline.get_nodes(journal, request.user)}), etag)
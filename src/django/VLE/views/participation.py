@@ -7,6 +7,7 @@ import VLE.utils.generic_utils as utils
 import VLE.utils.responses as response
 from VLE.models import Course, Group, Participation, Role, User
 from VLE.serializers import ParticipationSerializer, UserSerializer
+from VLE.utils import pagination
 
 
 class ParticipationView(viewsets.ViewSet):
@@ -17,6 +18,8 @@ class ParticipationView(viewsets.ViewSet):
         Arguments:
         request -- request data
             course_id -- course ID
+            limit, cursor -- optional keyset pagination, see VLE.utils.pagination
+            fields -- optional comma separated list of the user fields to serialize
 
         Returns:
         On failure:
@@ -33,8 +36,10 @@ class ParticipationView(viewsets.ViewSet):
 
         request.user.check_permission('can_view_course_users', course)
 
-        users = UserSerializer(course.users, context={'user': request.user, 'course': course}, many=True).data
-        return response.success({'participants': users})
+        users, page = pagination.paginate(request, course.users.all())
+        context = UserSerializer.setup_bulk_context(users, {'user': request.user, 'course': course})
+        users = UserSerializer(users, context=context, many=True, fields=pagination.requested_fields(request)).data
+        return response.success({'participants': users, **page})
 
     def retrieve(self, request, pk=None):
         """Get own participation data from the course ID.
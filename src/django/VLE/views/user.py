@@ -19,7 +19,7 @@ import VLE.validators as validators
 from VLE.models import Entry, FileContext, Instance, Journal, Node, User
 from VLE.serializers import EntrySerializer, FileSerializer, OwnUserSerializer, UserSerializer
 from VLE.tasks import send_email_verification_link
-from VLE.utils import file_handling
+from VLE.utils import file_handling, pagination
 from VLE.views import lti
 
 
@@ -49,6 +49,8 @@ class UserView(viewsets.ViewSet):
 
         Arguments:
         request -- request data
+            limit, cursor -- optional keyset pagination, see VLE.utils.pagination
+            fields -- optional comma separated list of the user fields to serialize
 
         Returns:
         On failure:
@@ -60,8 +62,44 @@ class UserView(viewsets.ViewSet):
         if not request.user.is_superuser:
             return response.forbidden('Only administrators are allowed to request all user data.')
 
-        serializer = UserSerializer(User.objects.all(), context={'user': request.user}, many=True)
-        return response.success({'users': serializer.data})
+        users, page = pagination.paginate(request, User.objects.all())
+        fields = pagination.requested_fields(request)
+
+        def serialize(users):
+            context = UserSerializer.setup_bulk_context(users, {'user': request.user})
+            return UserSerializer(users, context=context, many=True, fields=fields).data
+
+        # Without a page, large lists of users are streamed a chunk at a time
+        if not page:
+            return response.stream_json({'users': response.StreamedList(users, serialize)})
+        return response.success({'users': serialize(users), **page})
+
+    @action(['get'], detail=False)
+    def search(self, request):
+        """Search the users the user can view.
+
+        Arguments:
+        request -- request data
+            query -- text that should be part of the username or full name, or the email for administrators
+            limit, cursor -- optional keyset pagination, see VLE.utils.pagination, defaults to DEFAULT_PAGE_SIZE users
+            fields -- optional comma separated list of the user fields to serialize
+
+        Returns:
+        On failure:
+            unauthorized -- when the user is not logged in
+            bad request -- when the query or the limit is invalid
+        On success:
+            success -- with a page of the matching users and the next cursor
+        """
+        query, = utils.required_typed_params(request.query_params, (str, 'query'))
+        if not query.strip():
+            return response.bad_request('The search query cannot be empty.')
+
+        users = User.objects.viewable_by(request.user).search(query.strip(), email=request.user.is_superuser)
+        users, page = pagination.paginate(request, users, default_limit=settings.DEFAULT_PAGE_SIZE)
+        context = UserSerializer.setup_bulk_context(users, {'user': request.user})
+        serializer = UserSerializer(users, context=context, many=True, fields=pagination.requested_fields(request))
+        return response.success({'users': serializer.data, **page})
 
     def retrieve(self, request, pk):
         """Get the user data of the requested user.
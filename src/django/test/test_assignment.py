@@ -8,15 +8,18 @@ from dateutil import parser
 from dateutil.relativedelta import relativedelta
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.db.utils import IntegrityError
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 import VLE.factory
 import VLE.utils.generic_utils as utils
-from VLE.models import (Assignment, AssignmentParticipation, Course, Entry, Format, Journal, Node, Participation,
-                        PresetNode, Role, Template)
+from VLE.models import (Assignment, AssignmentParticipation, Course, Entry, Format, Grade, GradingQueueItem, Journal,
+                        Node, Participation, PresetNode, Role, Template, User)
 from VLE.serializers import AssignmentSerializer
+from VLE.utils import grading, request_cache
 from VLE.utils.error_handling import VLEParticipationError
 from VLE.views.assignment import day_neutral_datetime_increment, set_assignment_dates
 
@@ -605,6 +608,20 @@ class AssignmentAPITest(TestCase):
             'unpublished grades should now be published'
         assert not Entry.objects.get(pk=grade_other_journal.entry.pk).grade.published, \
             'grades not in assignment should not be published'
+        assert Grade.objects.filter(entry=grade_to_publish.entry).count() == 2 and \
+            Grade.objects.filter(entry=grade_published.entry).count() == 1, \
+            'only unpublished grades should get a published copy in their history'
+        assert not Journal.all_objects.all().outdated_summaries().exists(), 'journal summaries should be up to date'
+        assert not GradingQueueItem.objects.outdated(), 'the grading queue should be up to date'
+
+        def count_queries():
+            for _ in range(2):
+                factory.Grade(published=False, grade=1, entry__node__journal=journal)
+            with CaptureQueriesContext(connection) as context:
+                grading.publish_all_assignment_grades(journal.assignment, journal.assignment.author)
+            return len(context.captured_queries)
+
+        assert count_queries() == count_queries(), 'the number of queries should not depend on the number of grades'
 
     def test_get_active_course(self):
         no_startdate = factory.Course(startdate=None)
@@ -656,6 +673,42 @@ class AssignmentAPITest(TestCase):
         assert assignment.get_active_course(factory.Student()) is None, \
             'When someone is not related to the assignment, it should not respond with any course'
 
+    def test_get_active_course_queries(self):
+        course = factory.Course(startdate=None)
+        teacher = course.author
+        assignment = factory.Assignment(courses=[course, factory.Course(author=teacher)])
+
+        with request_cache.scope():
+            with self.assertNumQueries(1):
+                active_course = assignment.get_active_course(teacher)
+            with self.assertNumQueries(0):
+                assert assignment.get_active_course(teacher) == active_course, \
+                    'The active course should be reused for the remainder of the request'
+
+    def test_get_active_courses(self):
+        teacher = factory.Teacher()
+        past_course = factory.Course(startdate=timezone.now() - datetime.timedelta(weeks=1), author=teacher)
+        future_course = factory.Course(startdate=timezone.now() + datetime.timedelta(weeks=1), author=teacher)
+        lti_course = factory.LtiCourseFactory(startdate=timezone.now() + datetime.timedelta(weeks=2), author=teacher)
+        lti_course.assignment_lti_id_set.append('lti_id')
+        lti_course.save()
+
+        assignments = [
+            factory.Assignment(courses=[past_course, future_course]),
+            factory.Assignment(courses=[future_course]),
+            factory.Assignment(courses=[past_course, lti_course], active_lti_id='lti_id'),
+            factory.Assignment(courses=[factory.Course()]),
+        ]
+        with request_cache.scope():
+            with self.assertNumQueries(1):
+                courses = Assignment.get_active_courses(assignments, teacher)
+            assert courses == {assignments[0].pk: past_course, assignments[1].pk: future_course,
+                               assignments[2].pk: lti_course, assignments[3].pk: None}
+            with self.assertNumQueries(0):
+                assert [assignment.get_active_course(teacher) for assignment in assignments] == \
+                    [courses[assignment.pk] for assignment in assignments], \
+                    'The active courses should be reused for the remainder of the request'
+
     def test_day_neutral_datetime_increment(self):
         dt = datetime.datetime(year=2018, month=9, day=1)
         inc = day_neutral_datetime_increment(dt, 13)
@@ -774,6 +827,22 @@ class AssignmentAPITest(TestCase):
         assert t1.user.pk not in ids, 'check if teacher is not in response'
         assert t2.pk not in ids, 'check if author of assignment is not in response'
 
+        for user in User.objects.all():
+            assert User.objects.can_have_journal(assignment).filter(pk=user.pk).exists() == \
+                (user.is_participant(assignment) and user.has_permission('can_have_journal', assignment)), \
+                'the bulk evaluation should match has_permission'
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                api.get(self, 'assignments/participants_without_journal', params={'pk': assignment.pk}, user=t2)
+            return len(context.captured_queries)
+
+        queries = count_queries()
+        for _ in range(3):
+            factory.AssignmentParticipation(user=factory.Student(), assignment=assignment)
+        count_queries()
+        assert count_queries() == queries, 'the number of queries should not depend on the number of participants'
+
     def test_bonus_helper(self):
         def test_bonus_helper(content, status=200, user=self.teacher, delimiter=','):
             if delimiter != ',':
@@ -1,6 +1,10 @@
-from django.core.management import call_command
+import test.factory as factory
+
+from django.core.management import CommandError, call_command
 from django.test import TestCase
 
+from VLE.models import AssignmentParticipation, GradingQueueItem, Journal
+
 
 class CommandsTestCase(TestCase):
     """Test the self made commands."""
@@ -8,3 +12,42 @@ class CommandsTestCase(TestCase):
     def test_presetdb(self):
         """Test preset_db."""
         call_command('preset_db')
+
+    def test_rebuild_journal_summaries(self):
+        """Test rebuild_journal_summaries."""
+        journal = factory.Journal()
+        factory.Grade(entry=factory.Entry(node__journal=journal), grade=2)
+        call_command('rebuild_journal_summaries', verify=True)
+
+        Journal.all_objects.filter(pk=journal.pk).update(published_points=0, submitted_count=5)
+        self.assertRaises(CommandError, call_command, 'rebuild_journal_summaries', verify=True)
+        call_command('rebuild_journal_summaries')
+        call_command('rebuild_journal_summaries', verify=True)
+        journal.refresh_from_db()
+        assert journal.published_points == 2 and journal.submitted_count == 1
+
+    def test_rebuild_journal_eligibility(self):
+        """Test rebuild_journal_eligibility."""
+        journal = factory.Journal()
+        call_command('rebuild_journal_eligibility', verify=True)
+        call_command('rebuild_journal_eligibility', benchmark=1)
+
+        AssignmentParticipation.objects.filter(journal=journal).update(eligible=False)
+        self.assertRaises(CommandError, call_command, 'rebuild_journal_eligibility', verify=True)
+        assert not Journal.objects.filter(pk=journal.pk).exists()
+        call_command('rebuild_journal_eligibility')
+        call_command('rebuild_journal_eligibility', verify=True)
+        assert Journal.objects.filter(pk=journal.pk).exists()
+
+    def test_rebuild_grading_queue(self):
+        """Test rebuild_grading_queue."""
+        journal = factory.Journal()
+        entry = factory.Entry(node__journal=journal)
+        factory.Grade(entry=factory.Entry(node__journal=journal), published=True)
+        call_command('rebuild_grading_queue', verify=True)
+
+        GradingQueueItem.objects.all().delete()
+        self.assertRaises(CommandError, call_command, 'rebuild_grading_queue', verify=True)
+        call_command('rebuild_grading_queue')
+        call_command('rebuild_grading_queue', verify=True)
+        assert list(GradingQueueItem.objects.values_list('entry', flat=True)) == [entry.pk]
@@ -1,7 +1,9 @@
 import test.factory as factory
 from test.utils import api
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 
 class CommonAPITest(TestCase):
@@ -22,3 +24,42 @@ class CommonAPITest(TestCase):
 
         # CHeck if a random student cannot view the names
         api.get(self, url, user=factory.Student(), status=403)
+
+    def test_batch_names(self):
+        assignment = self.journal.assignment
+        course = assignment.courses.first()
+        other_journal = factory.Journal(assignment=assignment)
+        params = {
+            'course_ids': course.pk,
+            'assignment_ids': assignment.pk,
+            'journal_ids': '{},{}'.format(self.journal.pk, other_journal.pk),
+        }
+
+        names = api.get(self, 'names', params=params, user=self.teacher)['names']
+        assert names['courses'] == {str(course.pk): course.name}
+        assert names['assignments'] == {str(assignment.pk): assignment.name}
+        assert names['journals'] == {
+            str(self.journal.pk): self.journal.get_name(),
+            str(other_journal.pk): other_journal.get_name(),
+        }
+
+        # Names that were just resolved for the user are not loaded again
+        with CaptureQueriesContext(connection) as context:
+            assert api.get(self, 'names', params=params, user=self.teacher)['names'] == names
+        for table in ['VLE_course', 'VLE_assignment', 'VLE_journal']:
+            assert not any('FROM "{}"'.format(table) in query['sql'] for query in context.captured_queries)
+
+        # Without a shared cache, permission changes in other processes would not invalidate the cached names
+        with override_settings(SHARED_CACHE=False):
+            with CaptureQueriesContext(connection) as context:
+                assert api.get(self, 'names', params=params, user=self.teacher)['names'] == names
+            assert any('FROM "VLE_course"' in query['sql'] for query in context.captured_queries)
+
+        # Every object should be viewable
+        api.get(self, 'names', params=params, user=self.student, status=403)
+        api.get(self, 'names', params={'journal_ids': self.journal.pk}, user=self.student)
+        # Removing the only author from a journal should not leave its name cached for them
+        self.journal.authors.remove(self.journal.authors.get(user=self.student))
+        api.get(self, 'names', params={'journal_ids': self.journal.pk}, user=self.student, status=404)
+        api.get(self, 'names', params={'course_ids': course.pk + 1000}, user=self.teacher, status=404)
+        api.get(self, 'names', params={'course_ids': 'a'}, user=self.teacher, status=400)
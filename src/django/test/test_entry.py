@@ -4,7 +4,7 @@ from test.utils import api
 
 from django.test import TestCase
 
-from VLE.models import Entry, Field, Node
+from VLE.models import Entry, Field, GradingQueueItem, Node, Participation
 from VLE.utils import generic_utils as utils
 from VLE.utils.error_handling import VLEPermissionError
 
@@ -41,8 +41,11 @@ class EntryAPITest(TestCase):
         resp = api.create(self, 'entries', params=self.valid_create_params, user=self.student)['entry']
         entry = Entry.objects.get(pk=resp['id'])
         self.student.check_can_edit(entry)
-        resp2 = api.create(self, 'entries', params=self.valid_create_params, user=self.student)['entry']
+        created = api.create(self, 'entries', params=self.valid_create_params, user=self.student)
+        resp2 = created['entry']
         assert resp['id'] != resp2['id'], 'Multiple creations should lead to different ids'
+        assert created['nodes'][created['added']]['entry']['id'] == resp2['id'], \
+            'Added index should point to the created entry in the returned timeline'
         assert resp['author'] == self.student.full_name
 
         # Check if students cannot update journals without required parts filled in
@@ -99,7 +102,6 @@ class EntryAPITest(TestCase):
 
         # TODO: Test for entry bound to entrydeadline
         # TODO: Test with file upload
-        # TODO: Test added index
 
     def test_valid_entry(self):
         template = factory.TemplateAllTypes(format=self.format)
@@ -305,6 +307,33 @@ class EntryAPITest(TestCase):
             'First and last grade should be published.'
         assert not grade_history[1]['published'], 'Second grade should be unpublished.'
 
+    def test_grading_queue(self):
+        def queue(**params):
+            entries = api.get(self, 'grades/queue', params=params, user=self.teacher)['entries']
+            return [entry['entry_id'] for entry in entries]
+
+        first = api.create(self, 'entries', params=self.valid_create_params, user=self.student)['entry']
+        second = api.create(self, 'entries', params={**self.valid_create_params, 'journal_id': self.journal2.pk},
+                            user=self.student2)['entry']
+        assert queue() == [first['id'], second['id']], 'The longest waiting entry should be graded first'
+        assert api.get(self, 'grades/queue', user=self.student)['entries'] == [], \
+            'Only entries of assignments the user can grade should be queued'
+
+        group = factory.Group(course=self.journal.assignment.courses.first())
+        Participation.objects.get(user=self.student2, course=group.course).groups.add(group)
+        assert queue(group_id=group.pk) == [second['id']]
+        assert queue(assignment_id=self.journal.assignment.pk, limit=1) == [first['id']]
+
+        api.create(self, 'grades', params={'entry_id': first['id'], 'grade': 1, 'published': False}, user=self.teacher)
+        assert queue() == [second['id']]
+        assert queue(state=GradingQueueItem.UNPUBLISHED) == [first['id']]
+        api.create(self, 'grades', params={'entry_id': first['id'], 'grade': 1, 'published': True}, user=self.teacher)
+        assert queue(state=GradingQueueItem.UNPUBLISHED) == []
+
+        api.get(self, 'grades/queue', params={'state': 'graded'}, user=self.teacher, status=400)
+        api.get(self, 'grades/queue', params={'assignment_id': self.journal.assignment.pk}, user=self.student,
+                status=403)
+
     def test_keep_entry_on_delete_preset(self):
         entrydeadline = factory.EntrydeadlineNode(format=self.format)
 
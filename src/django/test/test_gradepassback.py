@@ -3,16 +3,62 @@ test_gradepassback.py.
 
 Test the lti grade passback.
 """
+import socket
 import test.factory as factory
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from test.utils import api
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
 
 import VLE.lti_grade_passback as lti_grade
 import VLE.tasks.beats.lti as lti_beats
-from VLE.models import Entry
+from VLE.models import Entry, Journal, PassbackOutbox
 from VLE.utils import grading
 
+SUCCESS_XML = b'<?xml version="1.0" encoding="UTF-8"?>\
+<imsx_POXEnvelopeResponse xmlns="http://www.imsglobal.org/services/ltiv1p1/xsd/imsoms_v1p0">\
+<imsx_POXHeader><imsx_POXResponseHeaderInfo><imsx_version>V1.0</imsx_version><imsx_messageIdentifier/>\
+<imsx_statusInfo><imsx_codeMajor>success</imsx_codeMajor><imsx_severity>status</imsx_severity>\
+<imsx_description>grade replaced</imsx_description><imsx_messageRefIdentifier>2</imsx_messageRefIdentifier>\
+<imsx_operationRefIdentifier>replaceResult</imsx_operationRefIdentifier></imsx_statusInfo>\
+</imsx_POXResponseHeaderInfo></imsx_POXHeader><imsx_POXBody>\
+<replaceResultResponse/></imsx_POXBody></imsx_POXEnvelopeResponse>'
+
+
+@contextmanager
+def local_lms(received, statuses=()):
+    """Run an LMS on localhost for the duration of the context, yielding its grade passback url.
+
+    The bodies of the requests are appended to received. The LMS responds with the given statuses first, and succeeds
+    after that.
+    """
+    statuses = list(statuses)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            received.append(self.rfile.read(int(self.headers['Content-Length'])))
+            self.send_response(statuses.pop() if statuses else 200)
+            self.send_header('Content-Type', 'application/xml')
+            self.send_header('Content-Length', str(len(SUCCESS_XML)))
+            self.end_headers()
+            self.wfile.write(SUCCESS_XML)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield 'http://127.0.0.1:{}/grade_passback'.format(server.server_address[1])
+    finally:
+        server.shutdown()
+        server.server_close()
+
 
 class GradePassBackRequestXMLTest(TestCase):
     """Test XML grade passpack.
@@ -32,6 +78,9 @@ class GradePassBackRequestXMLTest(TestCase):
         self.journal = factory.Journal(assignment=self.assignment)
         self.journal.authors.add(ap)
         self.journal.save()
+        # Sequences are not rolled back with the test transaction, start the message ids at 0 for every test
+        with connection.cursor() as cursor:
+            cursor.execute('ALTER SEQUENCE "VLE_message_id_seq" RESTART')
 
     def test_create_grade_passback(self):
         """Test if the GradePassBackRequest is correctly created when a journal is given"""
@@ -173,6 +222,43 @@ class GradePassBackRequestXMLTest(TestCase):
         factory.Entry(node__journal=self.journal)
         lti_beats.check_if_need_VLE_publish()
 
+    def test_needs_lms_passback(self):
+        def needs_passback():
+            return list(Journal.objects.needs_lms_passback().values_list('pk', flat=True))
+
+        entry = factory.Entry(node__journal=self.journal, vle_coupling=Entry.SENT_SUBMISSION)
+        factory.Entry(node__journal=factory.Journal(assignment=self.assignment), vle_coupling=Entry.NEEDS_SUBMISSION)
+        assert needs_passback() == [], 'Only journals with changes and an author linked to the LMS should be sent'
+
+        factory.Grade(entry=entry, grade=2, published=True)
+        assert needs_passback() == [self.journal.pk], 'A published grade should be sent'
+
+        Entry.objects.filter(pk=entry.pk).update(vle_coupling=Entry.LINK_COMPLETE)
+        assert needs_passback() == [self.journal.pk], 'A grade that differs from the last sent grade should be sent'
+        Journal.objects.filter(pk=self.journal.pk).update(LMS_grade=2)
+        assert needs_passback() == []
+
+        # Fractional grades are sent rounded to 2 decimals
+        Journal.objects.filter(pk=self.journal.pk).update(bonus_points=1 / 3)
+        assert needs_passback() == [self.journal.pk]
+        Journal.objects.filter(pk=self.journal.pk).update(LMS_grade=round(2 + 1 / 3, 2))
+        assert needs_passback() == [], 'A fractional grade that was sent should not be sent again'
+
+    def test_passback_outbox(self):
+        # Without a sourcedid nothing is sent, so the outbox can be drained offline
+        self.journal.authors.update(sourcedid=None)
+        entry = factory.Entry(node__journal=self.journal)
+        for grade in [1, 2]:
+            api.create(self, 'grades', params={'entry_id': entry.id, 'grade': grade, 'published': True},
+                       user=self.teacher)
+        assert list(PassbackOutbox.objects.values_list('journal', flat=True)) == [self.journal.pk], \
+            'Changes to the same journal should be coalesced'
+
+        assert lti_beats.drain_passback_outbox() == {}, 'Journals should wait for the window before being sent'
+        with override_settings(LMS_PASSBACK_WINDOW=0):
+            assert list(lti_beats.drain_passback_outbox()) == [self.journal.pk]
+        assert not PassbackOutbox.objects.exists()
+
     def test_replace_result_no_url(self):
         """Hopefully doesnt crash."""
         entry = factory.Entry(node__journal=self.journal)
@@ -184,3 +270,43 @@ class GradePassBackRequestXMLTest(TestCase):
             author.save()
 
         assert not grading.send_journal_status_to_LMS(self.journal)['successful']
+
+    @override_settings(LTI_PASSBACK_BACKOFF=0)
+    def test_send_post_requests(self):
+        """Send requests concurrently to a local LMS, retrying its server errors."""
+        received = []
+        with local_lms(received, statuses=[503]) as url:
+            author = self.journal.authors.first()
+            author.grade_url = url
+            requests = [lti_grade.GradePassBackRequest(author, grade, send_score=True) for grade in [1, 2, 3]]
+            responses = lti_grade.GradePassBackRequest.send_post_requests([requests[0], None, *requests[1:]])
+
+        assert responses[1] is None
+        assert [response['code_mayor'] for response in responses if response] == ['success'] * 3
+        assert [response['grade'] for response in responses if response] == [request.score for request in requests], \
+            'Responses should be returned in the order of the requests'
+        assert len(received) == 4, 'The server error should be retried'
+
+    @override_settings(LTI_PASSBACK_BACKOFF=0, LTI_PASSBACK_RETRIES=1)
+    def test_send_journals_status_unreachable_lms(self):
+        """A journal of which the LMS cannot be reached should not affect the other journals sent with it."""
+        # Nothing listens on a port that was just released
+        with socket.socket() as closed:
+            closed.bind(('127.0.0.1', 0))
+            unreachable_url = 'http://127.0.0.1:{}/grade_passback'.format(closed.getsockname()[1])
+
+        journals = [factory.Journal(assignment=self.assignment) for _ in range(3)]
+        for journal in journals:
+            factory.Grade(entry=factory.Entry(node__journal=journal), grade=2, published=True)
+
+        received = []
+        with local_lms(received) as url:
+            for journal, grade_url in zip(journals, [url, unreachable_url, url]):
+                journal.authors.update(sourcedid='f6d552', grade_url=grade_url)
+            results = grading.send_journals_status_to_LMS(
+                Journal.objects.filter(pk__in=[journal.pk for journal in journals]).order_by('pk'))
+
+        assert [results[journal.pk]['successful'] for journal in journals] == [True, False, True]
+        assert received, 'The reachable LMS should have received the grades'
+        assert [Journal.objects.get(pk=journal.pk).LMS_grade for journal in journals] == [2, 0, 2], \
+            'Only the journals that were sent successfully should be marked as sent'
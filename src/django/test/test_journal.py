@@ -1,10 +1,16 @@
+import json
 import test.factory as factory
 from test.utils import api
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 import VLE.factory
-from VLE.models import Journal
+import VLE.utils.responses as response
+from VLE.models import AssignmentParticipation, Journal, Participation
+from VLE.serializers import JournalSerializer
+from VLE.utils import request_cache
 from VLE.utils.error_handling import VLEBadRequest
 
 
@@ -35,6 +41,36 @@ class JournalAPITest(TestCase):
         api.get(self, 'journals', params={'pk': self.journal.pk}, user=self.teacher)
         api.get(self, 'journals', params={'pk': self.journal.pk}, user=factory.Teacher(), status=403)
 
+    def test_conditional_get(self):
+        access = api.login(self, self.teacher)['access']
+        role = factory.Role(course=self.course, name='Auditor', can_have_journal=True)
+
+        def get_journal(etag=None):
+            headers = {'HTTP_AUTHORIZATION': 'Bearer ' + access}
+            if etag is not None:
+                headers['HTTP_IF_NONE_MATCH'] = etag
+            return self.client.get('/journals/{}/'.format(self.journal.pk), **headers)
+
+        etag = get_journal()['ETag']
+        assert get_journal(etag).status_code == 304, 'Unchanged journals should not be sent again'
+
+        # The roles and groups of the authors are part of the journal
+        participation = Participation.objects.get(user=self.student, course=self.course)
+        participation.groups.add(factory.Group(course=self.course))
+        response = get_journal(etag)
+        assert response.status_code == 200, 'Adding an author to a group should change the ETag'
+        etag = response['ETag']
+
+        participation.role = role
+        participation.save()
+        response = get_journal(etag)
+        assert response.status_code == 200, 'Changing the role of an author should change the ETag'
+
+        with override_settings(SHARED_CACHE=False):
+            response = get_journal(response['ETag'])
+            assert response.status_code == 200 and not response.has_header('ETag'), \
+                'ETags should only be used when the cache is shared between processes'
+
     def test_create_journal(self):
         payload = {
             'pk': self.group_journal.pk,
@@ -107,6 +143,154 @@ class JournalAPITest(TestCase):
             self, 'journals', params={'assignment_id': assignment.pk, 'course_id': course1.pk}, user=course2.author,
             status=403)
 
+    def test_list_journal_paginated(self):
+        assignment = factory.Assignment()
+        course = assignment.courses.first()
+        journals = [factory.Journal(assignment=assignment) for _ in range(3)]
+        params = {'assignment_id': assignment.pk, 'course_id': course.pk, 'limit': 2, 'fields': 'id,name'}
+
+        result = api.get(self, 'journals', params=params, user=course.author)
+        assert [journal['id'] for journal in result['journals']] == [journal.pk for journal in journals[:2]]
+        assert all(set(journal) == {'id', 'name'} for journal in result['journals']), \
+            'Only the requested fields should be serialized'
+
+        result = api.get(self, 'journals', params={**params, 'cursor': result['next_cursor']}, user=course.author)
+        assert [journal['id'] for journal in result['journals']] == [journals[2].pk]
+        assert result['next_cursor'] is None, 'The last page should not have a next cursor'
+
+        api.get(self, 'journals', params={**params, 'limit': 0}, user=course.author, status=400)
+
+    @override_settings(STREAM_CHUNK_SIZE=2)
+    def test_list_journal_streamed(self):
+        assignment = factory.Assignment()
+        course = assignment.courses.first()
+        journals = [factory.Journal(assignment=assignment) for _ in range(5)]
+
+        streamed = api.get(self, 'journals', params={'assignment_id': assignment.pk, 'course_id': course.pk},
+                           user=course.author)
+        assert streamed.streaming, 'Lists larger than a chunk should be streamed'
+        result = json.loads(b''.join(streamed.streaming_content))
+        assert [journal['id'] for journal in result['journals']] == [journal.pk for journal in journals], \
+            'All journals should be streamed in order, over multiple chunks'
+        assert result['journals'][0] == JournalSerializer(
+            journals[0], context={'user': course.author, 'course': course}).data
+
+        result = api.get(self, 'journals', params={'assignment_id': self.assignment.pk, 'course_id': self.course.pk},
+                         user=self.teacher)
+        assert [journal['id'] for journal in result['journals']] == [self.journal.pk], \
+            'Lists that fit in a single chunk should be returned as a normal response'
+
+        def serialize(journals):
+            if journals[0] != assignment.journal_set.order_by('pk').first():
+                raise ValueError('Failed to serialize')
+            return [journal.pk for journal in journals]
+
+        streamed = response.stream_json({'journals': response.StreamedList(assignment.journal_set.all(), serialize)})
+        content = iter(streamed.streaming_content)
+        assert next(content) == b'{'
+        with self.assertRaises(ValueError):
+            b''.join(content)
+
+    def test_eager_loaded_journals(self):
+        factory.Grade(entry=factory.Entry(node__journal=self.journal), grade=3)
+        factory.Grade(entry=factory.Entry(node__journal=self.journal), grade=2, published=False)
+        factory.Entry(node__journal=self.journal)
+        other_journal = factory.Journal(assignment=self.assignment)
+        other_journal.bonus_points = 1.5
+        other_journal.save()
+        factory.Grade(entry=factory.Entry(node__journal=other_journal), grade=4)
+
+        def serialize():
+            with request_cache.scope():
+                journals = JournalSerializer.setup_eager_loading(Journal.objects.filter(assignment=self.assignment))
+                context = JournalSerializer.setup_bulk_context(journals, {'user': self.teacher, 'course': self.course})
+                return JournalSerializer(journals, many=True, context=context).data
+
+        serialized = serialize()
+        stats = next(journal['stats'] for journal in serialized if journal['id'] == self.journal.pk)
+        assert stats == {'acquired_points': 3, 'graded': 2, 'published': 1, 'submitted': 3}
+        assert next(journal['grade'] for journal in serialized if journal['id'] == other_journal.pk) == 5.5
+        assert all(journal['authors'][0]['user']['role'] == 'Student' for journal in serialized)
+
+        with CaptureQueriesContext(connection) as context:
+            serialize()
+        for _ in range(3):
+            factory.Journal(assignment=self.assignment)
+        with self.assertNumQueries(len(context.captured_queries)):
+            assert len(serialize()) == 5
+
+    def test_journal_summary(self):
+        entry = factory.Entry(node__journal=self.journal)
+        VLE.factory.make_grade(entry, self.teacher.pk, 3, False)
+        self.journal.refresh_from_db()
+        assert (self.journal.submitted_count, self.journal.graded_count, self.journal.unpublished_count) == (1, 1, 1)
+        assert self.journal.get_grade() == 0
+        assert self.journal.last_activity == entry.grade.creation_date
+
+        VLE.factory.make_grade(entry, self.teacher.pk, 3, True)
+        other = factory.Entry(node__journal=self.journal)
+        self.journal.bonus_points = 1
+        self.journal.save()
+        assert self.journal.get_grade() == 4
+        self.journal.refresh_from_db()
+        assert (self.journal.submitted_count, self.journal.published_count, self.journal.unpublished_count) == (2, 1, 0)
+
+        stale = Journal.objects.get(pk=self.journal.pk)
+        entry.grade.delete()
+        stale.save()
+        assert (stale.published_points, stale.graded_count) == (0, 0), 'Saving should not write an outdated summary'
+        assert stale.get_grade() == 1
+
+        entry.node.delete()
+        entry.delete()
+        other.delete()
+        self.journal.refresh_from_db()
+        assert (self.journal.submitted_count, self.journal.published_points) == (0, 0)
+        assert not Journal.all_objects.all().outdated_summaries().exists()
+
+    def test_journal_eligibility(self):
+        course = self.assignment.courses.first()
+        participation = Participation.objects.get(user=self.student, course=course)
+
+        def check(eligible):
+            assert Journal.objects.filter(pk=self.journal.pk).exists() == eligible
+            assert set(Journal.objects.values_list('pk', flat=True)) == \
+                set(Journal.all_objects.eligible_by_joins().values_list('pk', flat=True))
+            assert not AssignmentParticipation.objects.all().outdated_eligibility().exists()
+
+        check(True)
+        stale = AssignmentParticipation.objects.get(user=self.student, assignment=self.assignment)
+        participation.role.can_have_journal = participation.role.can_comment = False
+        participation.role.save()
+        check(False)
+        stale.save()
+        check(False)
+        participation.role.can_have_journal = participation.role.can_comment = True
+        participation.role.save()
+        check(True)
+
+        group = factory.Group(course=course)
+        self.assignment.assigned_groups.add(group)
+        check(False)
+        participation.groups.add(group)
+        check(True)
+        group.participation_set.clear()
+        check(False)
+        group.delete()
+        check(True)
+
+        participation.delete()
+        check(False)
+        self.assignment.courses.add(course)
+        factory.Participation(user=self.student, course=course, role=participation.role)
+        check(True)
+
+        assert Journal.objects.all().ordered, 'Journals should be ordered by default'
+        journals = Journal.objects.filter(assignment=self.assignment).order_by('-pk')
+        assert not journals.query.distinct, 'The eligibility semi-join cannot produce duplicates'
+        assert list(journals) == sorted(journals, key=lambda journal: -journal.pk), \
+            'The ordering of the caller should be kept'
+
     def test_update_journal(self):
         # Check if students need to specify a name to update journals
         api.update(self, 'journals', params={'pk': self.journal.pk}, user=self.student, status=400)
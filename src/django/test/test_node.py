@@ -15,3 +15,32 @@ class NodeTest(TestCase):
         api.get(self, 'nodes', params={'journal_id': self.journal.pk}, user=factory.Admin())
         api.get(self, 'nodes', params={'journal_id': self.journal.pk}, user=factory.Teacher(), status=403)
         api.get(self, 'nodes', params={'journal_id': self.journal.pk}, user=self.teacher)
+
+    def test_conditional_get(self):
+        access = api.login(self, self.student)['access']
+
+        def get_nodes(etag=None):
+            headers = {'HTTP_AUTHORIZATION': 'Bearer ' + access}
+            if etag is not None:
+                headers['HTTP_IF_NONE_MATCH'] = etag
+            return self.client.get('/nodes/', {'journal_id': self.journal.pk}, **headers)
+
+        response = get_nodes()
+        assert response.status_code == 200
+        etag = response['ETag']
+        assert get_nodes(etag).status_code == 304, 'Unchanged nodes should not be sent again'
+
+        # Any change to the journal gives a new ETag
+        entry = factory.Entry(node__journal=self.journal)
+        response = get_nodes(etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+        etag = response['ETag']
+
+        factory.Grade(entry=entry)
+        assert get_nodes(etag).status_code == 200, 'Grading an entry should change the ETag'
+
+        # The ETag is specific to the user
+        response = get_nodes()
+        access = api.login(self, self.teacher)['access']
+        assert get_nodes(response['ETag']).status_code == 200
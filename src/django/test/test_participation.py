@@ -1,9 +1,12 @@
 import test.factory as factory
 from test.utils import api
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from VLE.models import Role, User
+from VLE.models import Participation, Role, User
+from VLE.serializers import UserSerializer
 
 
 class ParticipationAPITest(TestCase):
@@ -33,6 +36,32 @@ class ParticipationAPITest(TestCase):
         resp = api.get(self, 'participations', params={'pk': self.course.pk}, user=self.teacher)
         assert resp['participant']['user']['id'] == self.teacher.pk
 
+    def test_list_bulk(self):
+        Participation.objects.get(user=self.student, course=self.course).groups.add(self.group1)
+        other_course = factory.Course()
+        other = factory.Participation(course=other_course).user
+        factory.Participation(course=self.course, user=other)
+
+        def serialize(viewer):
+            users = self.course.users.all()
+            context = {'user': viewer, 'course': self.course}
+            with CaptureQueriesContext(connection) as queries:
+                data = UserSerializer(
+                    users, context=UserSerializer.setup_bulk_context(users, context), many=True).data
+            assert data == UserSerializer(self.course.users.all(), context=context, many=True).data, \
+                'The bulk context should not change the serialized users'
+            return len(queries.captured_queries)
+
+        for viewer in [self.teacher, self.student, other]:
+            serialize(viewer)
+        queries = serialize(self.student)
+
+        for _ in range(3):
+            factory.Participation(course=self.course).groups.add(self.group2)
+        # Adding participations invalidates the cached permissions, so these are loaded first
+        serialize(self.student)
+        assert serialize(self.student) == queries, 'The number of queries should not depend on the number of users'
+
     def test_create(self):
         api.create(self, 'participations', params=self.create_params, user=self.student, status=403)
         api.create(self, 'participations', params=self.create_params, user=self.teacher)
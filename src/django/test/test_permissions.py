@@ -8,11 +8,12 @@ import test.factory as test_factory
 from test.factory.user import DEFAULT_PASSWORD
 
 from django.core.validators import ValidationError
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 import VLE.factory as factory
 import VLE.permissions as permissions
-from VLE.models import Participation, Role
+from VLE.models import Assignment, Participation, Role, User
+from VLE.utils import request_cache
 from VLE.utils.error_handling import VLEParticipationError, VLEPermissionError, VLEProgrammingError
 
 
@@ -278,6 +279,131 @@ class PermissionTests(TestCase):
         assert not result['can_have_journal']
         self.assertEqual(len(Role.ASSIGNMENT_PERMISSIONS), len(result))
 
+    def test_request_permission_matrix(self):
+        role = factory.make_role_default_no_perms("SD", self.course1, can_grade=True, can_view_all_journals=True)
+        factory.make_participation(self.user, self.course1, role)
+
+        with request_cache.scope():
+            # Loading the matrix and the courses of the assignment
+            with self.assertNumQueries(2):
+                assert self.user.has_permission('can_grade', self.assignment)
+                assert self.user.has_permission('can_view_all_journals', self.assignment)
+                assert not self.user.has_permission('can_have_journal', self.assignment)
+                assert not self.user.has_permission('can_delete_course', self.course1)
+                assert self.user.is_participant(self.course1)
+                assert self.user.is_participant(self.assignment)
+                assert not self.user.is_participant(self.course_independent)
+
+            role.can_grade = False
+            role.save()
+            assert not self.user.has_permission('can_grade', self.assignment)
+
+            self.assignment_independent.courses.add(self.course1)
+            assert self.user.has_permission('can_view_all_journals', self.assignment_independent)
+
+            Participation.objects.get(user=self.user, course=self.course1).delete()
+            assert not self.user.is_participant(self.course1)
+            assert not self.user.has_permission('can_view_all_journals', self.assignment)
+
+    def test_shared_permission_cache(self):
+        role = factory.make_role_default_no_perms("SD", self.course1, can_grade=True, can_view_all_journals=True)
+        factory.make_participation(self.user, self.course1, role)
+        stats = permissions.permission_cache_stats()
+
+        # Loading the matrix and the courses of the assignment, both are missed once and then shared across requests
+        with self.assertNumQueries(2):
+            with request_cache.scope():
+                assert self.user.has_permission('can_grade', self.assignment)
+        with self.assertNumQueries(0):
+            with request_cache.scope():
+                assert self.user.has_permission('can_grade', self.assignment)
+        assert permissions.permission_cache_stats()['misses'] == stats['misses'] + 2
+        assert permissions.permission_cache_stats()['hits'] == stats['hits'] + 2
+
+        role.can_grade = False
+        role.save()
+        assert not self.user.has_permission('can_grade', self.assignment)
+        # Queryset updates send no signals, but invalidate as well
+        Role.objects.filter(pk=role.pk).update(can_grade=True)
+        assert self.user.has_permission('can_grade', self.assignment)
+
+        other_role = factory.make_role_default_no_perms("Other", self.course1)
+        self.assignment_independent.courses.add(self.course1)
+        assert self.user.has_permission('can_view_all_journals', self.assignment_independent)
+        Participation.objects.filter(user=self.user, course=self.course1).update(role=other_role)
+        assert not self.user.has_permission('can_view_all_journals', self.assignment_independent)
+        Participation.objects.filter(user=self.user, course=self.course1).update(role=role)
+        assert self.user.has_permission('can_view_all_journals', self.assignment_independent)
+
+        Participation.objects.get(user=self.user, course=self.course1).delete()
+        assert not self.user.has_permission('can_view_all_journals', self.assignment)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_unshared_permission_cache(self):
+        factory.make_participation(
+            self.user, self.course1, factory.make_role_default_no_perms("SD", self.course1, can_view_course_users=True))
+
+        # Invalidations would not reach other processes, so permissions are only reused within a request
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                with request_cache.scope():
+                    assert self.user.has_permission('can_view_course_users', self.course1)
+                    assert self.user.has_permission('can_view_course_users', self.course1)
+
+    def test_serialize_user_permissions(self):
+        teacher = test_factory.Teacher()
+        student = test_factory.Student()
+        factory.make_participation(teacher, self.course1, Role.objects.get(name='Teacher', course=self.course1))
+        factory.make_participation(teacher, self.course2, Role.objects.get(name='TA', course=self.course2))
+        factory.make_participation(teacher, self.course_independent,
+                                   Role.objects.get(name='Student', course=self.course_independent))
+        factory.make_participation(student, self.course1, Role.objects.get(name='Student', course=self.course1))
+        admin = test_factory.Admin()
+        factory.make_participation(admin, self.course2, Role.objects.get(name='Student', course=self.course2))
+
+        for user in [teacher, student, admin]:
+            expected = {'general': permissions.serialize_general_permissions(user)}
+            for course in user.participations.all():
+                expected['course' + str(course.pk)] = permissions.serialize_course_permissions(user, course)
+                for assignment in course.assignment_set.all():
+                    if user.has_permission('can_grade', assignment) or \
+                       user.has_permission('can_have_journal', assignment):
+                        expected['assignment' + str(assignment.pk)] = \
+                            permissions.serialize_assignment_permissions(user, assignment)
+
+            with self.assertNumQueries(1):
+                assert permissions.serialize_user_permissions(user) == expected
+
+        result = permissions.serialize_user_permissions(student)
+        assert 'assignment' + str(self.assignment_independent.pk) not in result
+        assert result['assignment' + str(self.assignment.pk)]['can_have_journal']
+        result = permissions.serialize_user_permissions(teacher)
+        assert not result['assignment' + str(self.assignment.pk)]['can_have_journal']
+        assert result['assignment' + str(self.assignment_independent.pk)]['can_have_journal']
+
+    def test_viewable_by(self):
+        journal = test_factory.Journal()
+        assignment = journal.assignment
+        course = assignment.courses.first()
+        student = journal.authors.first().user
+        other_journal = test_factory.Journal(assignment=assignment)
+        unpublished = test_factory.Assignment(courses=[course], is_published=False)
+        grouped = test_factory.Assignment(courses=[course])
+        group = test_factory.Group(course=course)
+        grouped.assigned_groups.add(group)
+        Participation.objects.get(user=student, course=course).groups.add(group)
+        ta = test_factory.Student()
+        factory.make_participation(ta, course, Role.objects.get(name='TA', course=course))
+
+        for user in [course.author, student, other_journal.authors.first().user, ta, self.user, test_factory.Admin()]:
+            for manager in [Assignment.objects, User.objects]:
+                expected = {obj.pk for obj in manager.all() if user.can_view(obj)}
+                assert set(manager.viewable_by(user).values_list('pk', flat=True)) == expected
+
+        assert unpublished not in Assignment.objects.viewable_by(student)
+        assert grouped in Assignment.objects.viewable_by(student)
+        assert grouped not in Assignment.objects.viewable_by(other_journal.authors.first().user)
+
     def test_is_supervisor(self):
         high_user = test_factory.Teacher()
         middle_user = test_factory.Student()
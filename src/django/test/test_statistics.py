@@ -10,6 +10,7 @@ from test.utils import api
 from django.test import TestCase
 
 import VLE.utils.generic_utils as utils
+from VLE.utils import statistics
 
 
 class StatisticsTests(TestCase):
@@ -31,3 +32,30 @@ class StatisticsTests(TestCase):
         assert self.journal.get_grade() == 8
         assert utils.get_submitted_count(entries) == 4
         assert utils.get_graded_count(entries) == 3
+
+    def test_assignments_stats(self):
+        """Test the stats of many assignments are computed with grouped queries."""
+        assignment = self.journal.assignment
+        course = assignment.courses.first()
+        teacher = course.author
+        other_journal = factory.Journal(assignment=assignment)
+        other_journal.bonus_points = 2
+        other_journal.save()
+        factory.Grade(entry=self.entries[0], grade=3)
+        factory.Grade(entry=self.entries[1], grade=2, published=False)
+        factory.Grade(entry=factory.Entry(node__journal=other_journal), grade=1)
+
+        assignments = [assignment] + [factory.Assignment(courses=[course]) for _ in range(3)]
+        for other in assignments[1:]:
+            factory.Entry(node__journal=factory.Journal(assignment=other))
+
+        with self.assertNumQueries(4):
+            stats = statistics.get_assignments_stats(assignments, teacher, lambda assignment: course)
+        # The students of the other assignments also have an (empty) journal in the first assignment
+        assert stats[assignment.pk] == {'needs_marking': 2, 'unpublished': 1, 'average_points': 6 / 5}
+        for other in assignments[1:]:
+            assert stats[other.pk] == {'needs_marking': 1, 'unpublished': 0, 'average_points': 0}
+
+        student = self.journal.authors.first().user
+        stats = statistics.get_assignments_stats([assignment], student, lambda assignment: course)
+        assert stats[assignment.pk] == {'average_points': 6 / 5}
@@ -6,11 +6,14 @@ Test all about the timeline.
 import datetime
 import test.factory as factory
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 import VLE.factory
 import VLE.timeline as timeline
-from VLE.models import Journal, Role
+from VLE.models import Journal, Role, Template
+from VLE.serializers import TemplateSerializer
 from VLE.utils import generic_utils as utils
 
 
@@ -83,3 +86,61 @@ class TimelineTests(TestCase):
 
         self.assertEqual(nodes[3]['type'], 'p')
         self.assertEqual(nodes[3]['target'], 10)
+
+    def test_json_queries(self):
+        """Test if the number of queries to build the timeline does not depend on the number of entries."""
+        def count_queries():
+            journal = Journal.objects.get(pk=self.journal.pk)
+            with CaptureQueriesContext(connection) as context:
+                timeline.get_nodes(journal, self.student)
+            return len(context.captured_queries)
+
+        entry = VLE.factory.make_entry(self.template, self.student)
+        VLE.factory.make_node(self.journal, entry)
+        # Warm up the shared permission cache first
+        count_queries()
+        single_entry = count_queries()
+
+        for _ in range(5):
+            entry = VLE.factory.make_entry(self.template, self.student)
+            VLE.factory.make_node(self.journal, entry)
+        self.assertEqual(count_queries(), single_entry)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_json_queries_uncached_templates(self):
+        """Test if the fields of templates that are not cached are prefetched, instead of loaded per template."""
+        def add_entry():
+            template = VLE.factory.make_entry_template('template', self.journal.assignment.format)
+            VLE.factory.make_field(template, 'field', 0)
+            VLE.factory.make_node(self.journal, VLE.factory.make_entry(template, self.student))
+
+        def count_queries():
+            journal = Journal.objects.get(pk=self.journal.pk)
+            with CaptureQueriesContext(connection) as context:
+                timeline.get_nodes(journal, self.student)
+            return len(context.captured_queries)
+
+        add_entry()
+        count_queries()
+        single_entry = count_queries()
+
+        for _ in range(5):
+            add_entry()
+        self.assertEqual(count_queries(), single_entry)
+
+    def test_cached_templates(self):
+        """Test if serialized templates are cached until the template or one of its fields changes."""
+        template = Template.objects.get(pk=self.template.pk)
+        data = TemplateSerializer.cached_data(template)
+        self.assertEqual(data, TemplateSerializer(template).data)
+        with self.assertNumQueries(0):
+            self.assertEqual(TemplateSerializer.cached_data(template), data)
+
+        field = template.field_set.first()
+        field.title = 'changed'
+        field.save()
+        self.assertIn('changed', [f['title'] for f in TemplateSerializer.cached_data(template)['field_set']])
+
+        utils.archive_templates([{'id': template.pk}])
+        template.refresh_from_db()
+        self.assertTrue(TemplateSerializer.cached_data(template)['archived'])
@@ -362,6 +362,26 @@ class UserAPITest(TestCase):
         # Underscore qualifies as special character
         validators.validate_password('Some_Password')
 
+    def test_search(self):
+        journal = factory.GroupJournal()
+        student = journal.authors.first().user
+        ap = factory.AssignmentParticipation(assignment=journal.assignment, user__full_name='Searched Coauthor')
+        journal.authors.add(ap)
+        factory.Student(full_name='Searched Stranger')
+
+        result = api.get(self, 'users/search', params={'query': 'coauthor'}, user=student)
+        assert [user['id'] for user in result['users']] == [ap.user.pk], 'Only viewable users should be found'
+        assert result['next_cursor'] is None
+
+        admin = factory.Admin()
+        result = api.get(self, 'users/search', params={'query': 'SEARCHED', 'limit': 1}, user=admin)
+        assert len(result['users']) == 1 and result['next_cursor'] is not None
+        result = api.get(
+            self, 'users/search', params={'query': 'SEARCHED', 'limit': 1, 'cursor': result['next_cursor']}, user=admin)
+        assert len(result['users']) == 1 and result['next_cursor'] is None
+
+        api.get(self, 'users/search', params={'query': ' '}, user=student, status=400)
+
     def test_can_view(self):
         journal = factory.GroupJournal()
         user1 = journal.authors.first().user